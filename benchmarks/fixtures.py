@@ -0,0 +1,68 @@
+import io
+import json
+import random
+import zipfile
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QColor, QImage
+
+WORDS = ["space", "dungeon", "pixel", "quest", "racer", "farm", "shadow", "puzzle", "tower", "island", "robot",
+         "legend", "night", "star", "castle", "drift"]
+
+
+def synthetic_games(count, server, seed=0):
+    # Same schema as the real games.json, names and developers repeat like real data.
+    rng = random.Random(seed)
+    games = []
+    for game_id in range(1, count + 1):
+        name = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 3))) + f" {game_id}"
+        games.append({
+            "ID": game_id,
+            "name": name,
+            "developer": f"Studio {rng.randint(1, max(count // 10, 1))}",
+            "devstatus": rng.choice(["Alpha", "Beta", "Released"]),
+            "description": "A synthetic game for benchmarks. " * rng.randint(1, 4),
+            "icon": server.url(f"/icons/{game_id}.png"),
+            "version": f"1.{rng.randint(0, 9)}.{rng.randint(0, 9)}",
+            "download_link_linux": server.url("/archives/game.zip"),
+            "download_link_win": server.url("/archives/game.zip"),
+            "exec_linux": "run.sh",
+            "exec_win": "run.exe",
+            "website": "https://example.com",
+        })
+    return {"revision": 1, "games": games}
+
+
+def catalog_bytes(catalog):
+    return json.dumps(catalog, indent=2).encode()
+
+
+def icon_bytes(game_id, size=64):
+    image = QImage(size, size, QImage.Format_RGB32)
+    image.fill(QColor.fromHsv(game_id * 37 % 360, 160, 200))
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(data)
+
+
+def archive_bytes(size, file_size=1 << 20, seed=0):
+    # Half incompressible, half highly compressible data, spread over many files.
+    rng = random.Random(seed)
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        written = 0
+        index = 0
+        while written < size:
+            length = min(file_size, size - written)
+            if index % 2:
+                data = rng.randbytes(length)
+            else:
+                data = (b"level data %d " % index) * (length // 16 + 1)
+                data = data[:length]
+            archive.writestr(f"data/file{index:05}.bin", data)
+            written += length
+            index += 1
+        archive.writestr("run.sh", "#!/bin/sh\necho benchmark\n")
+    return output.getvalue()
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[1:1] = [ROOT, os.path.join(ROOT, "src")]
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from fixtures import archive_bytes, catalog_bytes, icon_bytes, synthetic_games
+from server import StandInServer
+
+SEARCH_QUERY = "dungeon 12"
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": milliseconds(sum(samples) / len(samples)),
+        "max_ms": milliseconds(max(samples)),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def wait_until(app, condition, timeout=60):
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > timeout:
+            return None
+        app.processEvents()
+        time.sleep(0.002)
+    return time.perf_counter() - started
+
+
+def enter_work_dir(base, name):
+    # The launcher keeps its state next to the working directory.
+    work_dir = os.path.join(base, name)
+    os.makedirs(work_dir)
+    os.chdir(work_dir)
+    with open("settings.alauncher", "w") as settings_file:
+        json.dump({"metrics": False}, settings_file)
+    return work_dir
+
+
+def bench_catalog(server, size, catalog):
+    from src.catalog import catalog_changes, fetch_catalog, load_local_catalog, sync_catalog
+    url = server.url(f"/catalog-{size}.json")
+    results = {
+        "fetch_ms": milliseconds(timed(fetch_catalog, url, "games.json", "catalog_cache.alauncher")),
+        "revalidate_ms": milliseconds(timed(fetch_catalog, url, "games.json", "catalog_cache.alauncher")),
+    }
+    # One game changes upstream, the launcher only fetches the change file.
+    updated = {"revision": catalog["revision"] + 1,
+               "games": [dict(catalog["games"][0], name="Renamed")] + catalog["games"][1:]}
+    server.add_file("/changes/revision.json", catalog_bytes({"revision": updated["revision"],
+                                                             "oldest": updated["revision"]}))
+    server.add_file(f"/changes/{updated['revision']}.json",
+                    catalog_bytes(catalog_changes(catalog, updated, updated["revision"])))
+    server.add_file(f"/catalog-{size}.json", catalog_bytes(updated))
+    results["incremental_sync_ms"] = milliseconds(timed(sync_catalog, url, "games.json", "catalog_cache.alauncher"))
+    # Nothing changed since: revision.json is answered with 304, games.json only HEAD.
+    results["unchanged_sync_ms"] = milliseconds(timed(sync_catalog, url, "games.json", "catalog_cache.alauncher"))
+    results["load_local_ms"] = milliseconds(timed(load_local_catalog, "games.json"))
+    return results
+
+
+def bench_window(app, catalog):
+    from launcher import GameLauncher
+    window = GameLauncher()
+    window.engine.catalog_service.refreshed = True
+    results = {"populate_ms": milliseconds(timed(window.engine.set_catalog, catalog))}
+
+    started = time.perf_counter()
+    window.show()
+    app.processEvents()
+    results["show_ms"] = milliseconds(time.perf_counter() - started)
+
+    def visible_icons_loaded():
+        return all(window.icon_loader.is_loaded(game_id, window.game_list_model.game_by_id(game_id)["icon"])
+                   for game_id in window.visible_game_ids())
+    icons_seconds = wait_until(app, visible_icons_loaded)
+    results["visible_icons_ms"] = milliseconds(icons_seconds) if icons_seconds is not None else None
+
+    keystrokes = []
+    for length in range(1, len(SEARCH_QUERY) + 1):
+        started = time.perf_counter()
+        window.search_bar.setText(SEARCH_QUERY[:length])
+        window.search_timer.stop()
+        window.apply_search_filter()
+        app.processEvents()
+        keystrokes.append(time.perf_counter() - started)
+    results["keystroke"] = summarize(keystrokes)
+    window.search_bar.clear()
+    window.search_timer.stop()
+    window.apply_search_filter()
+
+    switches = []
+    for category in (1, 2, 3, 4, 0):
+        started = time.perf_counter()
+        window.category_combo.setCurrentIndex(category)
+        app.processEvents()
+        switches.append(time.perf_counter() - started)
+    results["category_switch"] = summarize(switches)
+
+    # Icons still loading would land in the next work directory.
+    window.icon_loader.pending.clear()
+    window.icon_loader.pool.waitForDone()
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return results
+
+
+def bench_download(server, archive_size, connections):
+    from src.downloads import download_file
+    target = os.path.join("downloads", f"game-{connections}.zip")
+    seconds = timed(download_file, server.url("/archives/game.zip"), target, connections=connections)
+    os.remove(target)
+    return {"seconds": round(seconds, 4), "mb_per_s": round(archive_size / seconds / (1 << 20), 2)}
+
+
+def bench_extraction(archive_path, processes):
+    import zipfile
+    from src.extraction import extract_archive
+    with zipfile.ZipFile(archive_path) as archive:
+        total = sum(info.file_size for info in archive.infolist())
+    destination = f"extracted-{processes}"
+    seconds = timed(extract_archive, archive_path, destination, processes=processes)
+    shutil.rmtree(destination)
+    return {"seconds": round(seconds, 4), "mb_per_s": round(total / seconds / (1 << 20), 2)}
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Launcher benchmarks against a local HTTP stand-in.")
+    parser.add_argument("--sizes", default="100,1000,10000", help="catalog sizes, comma separated")
+    parser.add_argument("--archive-mb", type=int, default=64, help="size of the game archive")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before every response")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="per-connection limit, 0 for none")
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    app = QApplication(sys.argv[:1])
+    server = StandInServer({}, latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbps * 125000).start()
+    catalogs = {}
+    for size in sizes:
+        catalogs[size] = synthetic_games(size, server)
+        server.add_file(f"/catalog-{size}.json", catalog_bytes(catalogs[size]))
+    for game_id in range(1, max(sizes) + 1):
+        server.add_file(f"/icons/{game_id}.png", icon_bytes(game_id))
+    archive = archive_bytes(args.archive_mb << 20)
+    server.add_file("/archives/game.zip", archive)
+
+    base = tempfile.mkdtemp(prefix="alauncher-bench-")
+    results = {"catalogs": {}}
+    try:
+        for size in sizes:
+            enter_work_dir(base, f"catalog-{size}")
+            results["catalogs"][size] = bench_catalog(server, size, catalogs[size])
+            results["catalogs"][size].update(bench_window(app, catalogs[size]))
+            print(f"{size} games:", json.dumps(results["catalogs"][size]))
+
+        enter_work_dir(base, "transfer")
+        results["download"] = {f"connections_{count}": bench_download(server, len(archive), count)
+                               for count in (1, 4)}
+        print("download:", json.dumps(results["download"]))
+        with open("game.zip", "wb") as archive_file:
+            archive_file.write(archive)
+        results["extraction"] = {"serial": bench_extraction("game.zip", 1),
+                                 "auto": bench_extraction("game.zip", 0)}
+        print("extraction:", json.dumps(results["extraction"]))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(base, ignore_errors=True)
+        server.shutdown()
+
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "results": results,
+    }
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print("Results written to", output)
+
+
+if __name__ == "__main__":
+    main()
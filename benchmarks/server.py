@@ -0,0 +1,104 @@
+import hashlib
+import http.server
+import threading
+import time
+
+CHUNK_SIZE = 64 << 10
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    # Serves files from memory with ETag, Range and optional latency/bandwidth limits.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        data = self.server.files.get(self.path.split("?")[0])
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+        else:
+            self.send_response(200)
+            self.send_header("ETag", self.server.etags[self.path.split("?")[0]])
+            self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        data = server.files.get(self.path.split("?")[0])
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = server.etags[self.path.split("?")[0]]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, len(data) - 1
+        range_header = self.headers.get("Range")
+        if self.headers.get("If-Range", etag) != etag:
+            # The file changed since the client's copy: send all of it.
+            range_header = None
+        if range_header and range_header.startswith("bytes="):
+            first, last = range_header[6:].split("-")
+            if not first:
+                start = max(len(data) - int(last), 0)
+            else:
+                start = int(first)
+                end = min(int(last), end) if last else end
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        # Each connection gets the full bandwidth, like a CDN edge would.
+        started = time.monotonic()
+        sent = 0
+        for offset in range(start, end + 1, CHUNK_SIZE):
+            chunk = data[offset:min(offset + CHUNK_SIZE, end + 1)]
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            if server.bandwidth:
+                ahead = sent / server.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, files, latency=0.0, bandwidth=0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.files = files
+        self.etags = {path: f'"{hashlib.md5(data).hexdigest()}"' for path, data in files.items()}
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def add_file(self, path, data):
+        self.files[path] = data
+        self.etags[path] = f'"{hashlib.md5(data).hexdigest()}"'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import urllib.request
+
+from src.downloads import validator_from
+from src.extraction import ExtractionCanceled
+from src.metrics import metrics
+from src.verify import hash_file, progress_reporter
+
+def probe_identity(url, timeout=30):
+    # Size and validator of the file on the server, read from the headers of a
+    # one byte range request so nothing else is transferred.
+    request = urllib.request.Request(url)
+    request.add_header("Range", "bytes=0-0")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status == 206:
+            size = response.headers.get("Content-Range", "").rpartition("/")[2]
+        else:
+            size = response.headers.get("Content-Length", "")
+        validator = validator_from(response)
+    if not size.isdigit() or not validator:
+        return None
+    return {"url": url, "size": int(size), "validator": validator}
+
+
+def link_or_copy(source, target):
+    # A hard link costs nothing; copy when the cache sits on another file system.
+    temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class ArchiveCache:
+    # Downloaded game archives, stored by SHA-256 under objects/ and found by
+    # URL, size and ETag through small key files under keys/. Every file is
+    # written to a temporary name and renamed into place, so several launchers
+    # can share one folder, also over NFS. The least recently used archives are
+    # removed once the cache is over its budget.
+    def __init__(self, folder, budget):
+        self.folder = folder
+        self.budget = budget
+        self.objects_folder = os.path.join(folder, "objects")
+        self.keys_folder = os.path.join(folder, "keys")
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_folder, sha256[:2], sha256)
+
+    def key_path(self, identity):
+        key = f"{identity['url']}\n{identity['size']}\n{identity['validator']}"
+        return os.path.join(self.keys_folder, hashlib.sha256(key.encode()).hexdigest() + ".alauncher")
+
+    def identify(self, url, sha256=None):
+        if sha256:
+            return {"url": url, "sha256": sha256.lower()}
+        try:
+            return probe_identity(url)
+        except OSError as e:
+            print("Can't check the archive cache:", e)
+            return None
+
+    def sha256_for(self, identity):
+        if "sha256" in identity:
+            return identity["sha256"]
+        try:
+            with open(self.key_path(identity), "r") as key_file:
+                return json.load(key_file)["sha256"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def fetch(self, identity, local_path, progress_callback=None, should_stop=None):
+        # Puts a cached copy of the archive at local_path after checking its hash.
+        sha256 = self.sha256_for(identity)
+        object_path = self.object_path(sha256) if sha256 else None
+        if object_path is None or not os.path.exists(object_path):
+            metrics.count("archive_cache_misses_total")
+            return False
+        if "size" in identity and os.path.getsize(object_path) != identity["size"]:
+            print("Cached archive has the wrong size, removing it")
+            self.discard(sha256)
+            metrics.count("archive_cache_misses_total")
+            return False
+        try:
+            actual = hash_file(object_path, "sha256",
+                               progress_reporter(os.path.getsize(object_path), progress_callback), should_stop)
+        except ExtractionCanceled:
+            return False
+        if actual != sha256:
+            print("Cached archive is damaged, removing it")
+            self.discard(sha256)
+            metrics.count("archive_cache_misses_total")
+            return False
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        link_or_copy(object_path, local_path)
+        os.utime(object_path)
+        metrics.count("archive_cache_hits_total")
+        return True
+
+    def store(self, identity, local_path, should_stop=None, sha256=None):
+        # sha256 is the archive's hash when the caller has already computed it.
+        if sha256 is None:
+            try:
+                sha256 = hash_file(local_path, "sha256", should_stop=should_stop)
+            except ExtractionCanceled:
+                return None
+        if "sha256" in identity and identity["sha256"] != sha256:
+            raise ValueError(f"Downloaded archive does not match its SHA-256 ({sha256})")
+        object_path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if not os.path.exists(object_path):
+            link_or_copy(local_path, object_path)
+        os.utime(object_path)
+        if "validator" in identity:
+            os.makedirs(self.keys_folder, exist_ok=True)
+            key_path = self.key_path(identity)
+            temp_path = f"{key_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as key_file:
+                json.dump({**identity, "sha256": sha256}, key_file)
+            os.replace(temp_path, key_path)
+        self.evict(keep=sha256)
+        return sha256
+
+    def discard(self, sha256):
+        try:
+            os.remove(self.object_path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        archives = []
+        for root, dirs, files in os.walk(self.objects_folder):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                archives.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in archives)
+        for _, size, sha256 in sorted(archives):
+            if total <= self.budget:
+                break
+            if sha256 == keep:
+                continue
+            self.discard(sha256)
+            total -= size
+            metrics.count("archive_cache_evictions_total")
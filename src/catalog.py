@@ -0,0 +1,284 @@
+import gc
+import http.client
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from src.metrics import metrics
+from src.scheduler import CATALOG, scheduler
+from src.workers import run_in_background
+
+CATALOG_URL = "https://raw.githubusercontent.com/anduslauncher/gamelist/master/games.json"
+CATALOG_PATH = "games.json"
+CATALOG_META_PATH = "catalog_cache.alauncher"
+CHANGES_FOLDER = "changes/"
+MAX_CHANGE_FILES = 50
+MAX_PARALLEL_FETCHES = 4
+
+
+def load_local_catalog(path=CATALOG_PATH):
+    # The collector would walk the half-built catalog over and over while
+    # tens of thousands of dicts and strings are created; parsing without it
+    # is about a third faster.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with metrics.timer("catalog_load_seconds"), open(path, "rb") as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print("Local game list is corrupt:", e)
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def save_local_catalog(data, path=CATALOG_PATH):
+    temp_path = path + ".tmp"
+    # json.dumps uses the C encoder, json.dump streaming to a file does not.
+    with open(temp_path, "w") as json_file:
+        json_file.write(json.dumps(data, separators=(",", ":")))
+    os.replace(temp_path, path)
+
+
+def load_catalog_meta(path=CATALOG_META_PATH):
+    try:
+        with open(path, "r") as meta_file:
+            return json.load(meta_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_catalog_meta(meta, path=CATALOG_META_PATH):
+    with open(path, "w") as meta_file:
+        json.dump(meta, meta_file)
+
+
+def fetch_catalog(url=CATALOG_URL, path=CATALOG_PATH, meta_path=CATALOG_META_PATH, timeout=15):
+    # Returns the new catalog, or None when the server reports it unchanged.
+    request = urllib.request.Request(url)
+    meta = load_catalog_meta(meta_path) if os.path.exists(path) else {}
+    if meta.get("etag"):
+        request.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        request.add_header("If-Modified-Since", meta["last_modified"])
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            new_meta = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            metrics.observe("catalog_fetch_seconds", time.perf_counter() - started, result="unchanged")
+            return None
+        raise
+    metrics.observe("catalog_fetch_seconds", time.perf_counter() - started, result="changed")
+
+    with metrics.timer("catalog_parse_seconds"):
+        data = json.loads(body)
+    # Stored without the server's indentation, it is read on every start.
+    save_local_catalog(data, path)
+    new_meta["revision"] = data.get("revision")
+    new_meta["changes_etag"] = meta.get("changes_etag")
+    save_catalog_meta(new_meta, meta_path)
+    return data
+
+
+def fetch_validators(url, timeout=15):
+    # ETag and Last-Modified of the whole catalog, without downloading it.
+    request = urllib.request.Request(url, method="HEAD")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def changes_url_for(url, name):
+    return urllib.parse.urljoin(url, CHANGES_FOLDER + name)
+
+
+def catalog_changes(old_data, new_data, revision):
+    # What changed between two catalogs, as published in changes/<revision>.json.
+    old_games = {game["ID"]: game for game in old_data["games"]}
+    new_ids = {game["ID"] for game in new_data["games"]}
+    return {
+        "revision": revision,
+        "games": [game for game in new_data["games"] if old_games.get(game["ID"]) != game],
+        "removed": [game_id for game_id in old_games if game_id not in new_ids],
+    }
+
+
+def apply_catalog_changes(data, changes):
+    removed = set(changes["removed"])
+    updated = {game["ID"]: game for game in changes["games"]}
+    games = []
+    for game in data["games"]:
+        if game["ID"] not in removed:
+            games.append(updated.pop(game["ID"], game))
+    games.extend(updated.values())
+    data["games"] = games
+    data["revision"] = changes["revision"]
+
+
+def fetch_json(url, timeout=15):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def fetch_revision(url, etag=None, timeout=15):
+    # (changes/revision.json, its ETag), or (None, etag) when it is unchanged.
+    request = urllib.request.Request(changes_url_for(url, "revision.json"))
+    if etag:
+        request.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read()), response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, etag
+        raise
+
+
+def fetch_changes(url, meta, timeout=15, local_size=0):
+    # Returns the change files published since meta["revision"], [] when nothing
+    # changed, or None when the whole list has to be fetched: the local copy is
+    # too old, the changes add up to more than the list (local_size is the size
+    # of the local copy), or games.json was edited without publishing a new
+    # revision. revision.json, the validators of games.json and the next change
+    # file are requested together, so the usual cases take one round trip.
+    import concurrent.futures
+    revision = meta["revision"]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PARALLEL_FETCHES) as executor:
+        latest = executor.submit(scheduler.bind(fetch_revision), url, meta.get("changes_etag"), timeout)
+        validators = executor.submit(scheduler.bind(fetch_validators), url, timeout)
+        next_change = executor.submit(scheduler.bind(fetch_json), changes_url_for(url, f"{revision + 1}.json"),
+                                      timeout)
+        latest, meta["changes_etag"] = latest.result()
+        try:
+            validators = validators.result()
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            print("Can't check the game list's validators:", e)
+            validators = {}
+        if latest is None or latest["revision"] == revision:
+            unchanged = any(validators.get(name) and validators[name] == meta.get(name)
+                            for name in ("etag", "last_modified"))
+            return [] if unchanged else None
+        if latest["revision"] < revision or revision + 1 < latest["oldest"] \
+                or latest["revision"] - revision > MAX_CHANGE_FILES:
+            return None
+        numbers = range(revision + 1, latest["revision"] + 1)
+        sizes = latest.get("sizes", {})
+        if local_size and sum(sizes.get(str(number), 0) for number in numbers) > local_size:
+            return None
+        later_changes = [executor.submit(scheduler.bind(fetch_json), changes_url_for(url, f"{number}.json"), timeout)
+                         for number in numbers[1:]]
+        changes = [next_change.result()] + [future.result() for future in later_changes]
+    # Kept for the next start, which compares them to find unpublished edits.
+    meta["etag"] = validators.get("etag")
+    meta["last_modified"] = validators.get("last_modified")
+    return changes
+
+
+def sync_catalog(url=CATALOG_URL, path=CATALOG_PATH, meta_path=CATALOG_META_PATH, timeout=15):
+    # Catches the local catalog up with the small change files published next
+    # to it, falling back to the whole catalog when the server has none, the
+    # local copy is too old or the changes are bigger than the list. Returns
+    # None when nothing changed.
+    meta = load_catalog_meta(meta_path) if os.path.exists(path) else {}
+    if meta.get("revision") is None:
+        return fetch_catalog(url, path, meta_path, timeout)
+    started = time.perf_counter()
+    changes_etag = meta.get("changes_etag")
+    try:
+        changes = fetch_changes(url, meta, timeout, os.path.getsize(path))
+    except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError, KeyError) as e:
+        print("Can't update the game list from its changes, downloading all of it:", e)
+        return fetch_catalog(url, path, meta_path, timeout)
+    if changes is None:
+        return fetch_catalog(url, path, meta_path, timeout)
+    if not changes:
+        # Nothing to rewrite, only a new ETag of revision.json is worth keeping.
+        metrics.observe("catalog_fetch_seconds", time.perf_counter() - started, result="unchanged")
+        if meta.get("changes_etag") != changes_etag:
+            save_catalog_meta(meta, meta_path)
+        return None
+    data = load_local_catalog(path)
+    if data is None:
+        return fetch_catalog(url, path, meta_path, timeout)
+    for change in changes:
+        apply_catalog_changes(data, change)
+    metrics.observe("catalog_fetch_seconds", time.perf_counter() - started, result="incremental")
+    save_local_catalog(data, path)
+    meta["revision"] = data["revision"]
+    save_catalog_meta(meta, meta_path)
+    return data
+
+
+def fetch_catalog_from(urls, path=CATALOG_PATH, meta_path=CATALOG_META_PATH, mirror_stats=None, timeout=15):
+    # Tries the catalog mirrors fastest first, as remembered from earlier sessions.
+    if mirror_stats is None or len(urls) < 2:
+        return sync_catalog(urls[0], path, meta_path, timeout)
+    error = None
+    for url in mirror_stats.rank(urls, probe=False):
+        started = time.perf_counter()
+        try:
+            data = sync_catalog(url, path, meta_path, timeout)
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+            print(f"Can't load the game list from {url}:", e)
+            mirror_stats.record_failure(url)
+            error = e
+            continue
+        mirror_stats.record_latency(url, time.perf_counter() - started)
+        mirror_stats.save_quietly()
+        return data
+    mirror_stats.save_quietly()
+    raise error
+
+
+class CatalogService(QObject):
+    catalog_changed = pyqtSignal(object)
+    refresh_failed = pyqtSignal(str)
+
+    def __init__(self, urls=(CATALOG_URL,), path=CATALOG_PATH, meta_path=CATALOG_META_PATH, mirror_stats=None,
+                 parent=None):
+        super().__init__(parent)
+        self.urls = list(urls)
+        self.mirror_stats = mirror_stats
+        self.path = path
+        self.meta_path = meta_path
+        self.refreshed = False
+        self.refreshing = False
+
+    def load_local(self):
+        return load_local_catalog(self.path)
+
+    def fetch(self):
+        with scheduler.traffic_class(CATALOG):
+            return fetch_catalog_from(self.urls, self.path, self.meta_path, self.mirror_stats)
+
+    def refresh(self, force=False):
+        if self.refreshing or (self.refreshed and not force):
+            return
+        self.refreshing = True
+        run_in_background(self.fetch, on_finished=self.on_fetch_finished, on_failed=self.on_fetch_failed)
+
+    def on_fetch_finished(self, data):
+        self.refreshing = False
+        self.refreshed = True
+        if data is not None:
+            self.catalog_changed.emit(data)
+
+    def on_fetch_failed(self, error):
+        self.refreshing = False
+        metrics.count("catalog_fetch_failures_total")
+        print("Error loading game list online:", error)
+        self.refresh_failed.emit(error)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import sys
+import time
+
+from PyQt5.QtCore import QCoreApplication, QThreadPool, QTimer
+
+from src.engine import PLATFORM, LauncherEngine
+from src.settings import load_settings
+from src.updates import find_outdated_games
+
+PROGRESS_INTERVAL = 0.5
+EVENTS = sys.stdout
+
+
+def emit(event, **fields):
+    # One JSON object per line on stdout, for scripts provisioning machines.
+    print(json.dumps({"event": event, **fields}), file=EVENTS, flush=True)
+
+
+def parse_game_ids(values):
+    game_ids = []
+    for value in values:
+        game_ids.append(int(value) if value.isdigit() else value)
+    return game_ids
+
+
+class BatchInstall:
+    def __init__(self, engine, games, repair=False):
+        self.engine = engine
+        self.games = games
+        self.repair = repair
+        self.pending = set()
+        self.updated = set()
+        self.failed = {}
+        self.last_report = {}
+        engine.install_progress.connect(self.on_progress)
+        engine.install_finished.connect(self.on_finished)
+        engine.install_failed.connect(self.on_failed)
+
+    def start(self):
+        for game_info in self.games:
+            self.pending.add(game_info["ID"])
+            emit("queued", id=game_info["ID"], name=game_info["name"], version=game_info["version"])
+            if self.repair:
+                # Outdated installs are updated rather than repaired.
+                if self.engine.installed_version(game_info["ID"]) != game_info["version"]:
+                    self.updated.add(game_info["ID"])
+                self.engine.repair(game_info)
+            else:
+                self.engine.install(game_info)
+        self.quit_if_done()
+
+    def on_progress(self, game_id, done, total, phase):
+        now = time.monotonic()
+        if now - self.last_report.get((game_id, phase), 0) >= PROGRESS_INTERVAL or done == total:
+            self.last_report[(game_id, phase)] = now
+            emit("progress", id=game_id, phase=phase, done=done, total=total)
+
+    def on_finished(self, game_id):
+        if game_id in self.pending:
+            self.pending.discard(game_id)
+            emit("repaired" if self.repair and game_id not in self.updated else "installed", id=game_id,
+                 version=self.engine.installed_version(game_id))
+            self.quit_if_done()
+
+    def on_failed(self, game_id, error):
+        if game_id in self.pending:
+            self.pending.discard(game_id)
+            self.failed[game_id] = error
+            emit("failed", id=game_id, error=error)
+            self.quit_if_done()
+
+    def quit_if_done(self):
+        if not self.pending:
+            QTimer.singleShot(0, QCoreApplication.instance().quit)
+
+
+def load_catalog(engine, offline):
+    if not offline:
+        try:
+            data = engine.catalog_service.fetch()
+            if data is not None:
+                engine.set_catalog(data)
+                return
+        except Exception as e:
+            emit("warning", message=f"Can't refresh the game list, using the local copy: {e}")
+    if engine.load_local_catalog() is None:
+        raise SystemExit("No game list available")
+
+
+def select_games(engine, game_ids, select_all, candidates):
+    # Returns the games to install and whether any requested ID was unknown.
+    if select_all:
+        return candidates, False
+    games = []
+    for game_id in game_ids:
+        game_info = engine.game_by_id(game_id)
+        if game_info is None:
+            emit("failed", id=game_id, error="Unknown game")
+        else:
+            games.append(game_info)
+    return games, len(games) < len(game_ids)
+
+
+def run_batch(engine, games, repair=False):
+    if not games:
+        return 0
+    batch = BatchInstall(engine, games, repair)
+    QTimer.singleShot(0, batch.start)
+    QCoreApplication.instance().exec_()
+    return 1 if batch.failed else 0
+
+
+def outdated_game_ids(engine):
+    installed_versions = {key: entry["version"] for key, entry in engine.install_state.games.items()}
+    return find_outdated_games(engine.games, installed_versions)
+
+
+def command_list(engine, args):
+    outdated = outdated_game_ids(engine)
+    for game_info in engine.games:
+        game_id = game_info["ID"]
+        emit("game", id=game_id, name=game_info["name"], version=game_info["version"],
+             installed_version=engine.installed_version(game_id) if engine.is_installed(game_id) else None,
+             outdated=game_id in outdated)
+    return 0
+
+
+def command_install(engine, args):
+    candidates = [game_info for game_info in engine.games
+                  if not engine.is_installed(game_info["ID"]) and f"download_link_{PLATFORM}" in game_info]
+    games, unknown = select_games(engine, parse_game_ids(args.ids), args.all, candidates)
+    return max(run_batch(engine, games), int(unknown))
+
+
+def command_update(engine, args):
+    outdated = outdated_game_ids(engine)
+    candidates = [game_info for game_info in engine.games if game_info["ID"] in outdated]
+    games, unknown = select_games(engine, parse_game_ids(args.ids), args.all, candidates)
+    return max(run_batch(engine, games), int(unknown))
+
+
+def command_verify(engine, args):
+    candidates = [game_info for game_info in engine.games if engine.is_installed(game_info["ID"])]
+    games, unknown = select_games(engine, parse_game_ids(args.ids), not args.ids, candidates)
+    damaged = []
+    for game_info in games:
+        game_id = game_info["ID"]
+        last_report = [0]
+
+        def on_progress(done, total, game_id=game_id):
+            now = time.monotonic()
+            if now - last_report[0] >= PROGRESS_INTERVAL or done == total:
+                last_report[0] = now
+                emit("progress", id=game_id, phase="verify", done=done, total=total)
+        problems = engine.verify(game_id, on_progress)
+        if problems:
+            damaged.append(game_info)
+        emit("verified", id=game_id, ok=not problems, problems=problems)
+    if args.repair:
+        return max(run_batch(engine, damaged, repair=True), int(unknown))
+    return 1 if damaged or unknown else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="launcher", description="Andus Launcher without the window.")
+    parser.add_argument("--offline", action="store_true", help="use the local game list only")
+    parser.add_argument("--jobs", type=int, default=2, help="games downloaded at the same time")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list games and their install state").set_defaults(run=command_list)
+    for name, run, help_text in (("install", command_install, "install games"),
+                                 ("update", command_update, "update installed games")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("ids", nargs="*", help="game IDs")
+        command.add_argument("--all", action="store_true", help="every game that needs it")
+        command.set_defaults(run=run)
+    command = commands.add_parser("verify", help="check the files of installed games")
+    command.add_argument("ids", nargs="*", help="game IDs, every installed game by default")
+    command.add_argument("--repair", action="store_true", help="fetch damaged or missing files again")
+    command.set_defaults(run=command_verify)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command in ("install", "update") and not args.ids and not args.all:
+        build_parser().error(f"{args.command} needs game IDs or --all")
+    # Everything else the launcher prints goes to stderr, stdout only carries events.
+    sys.stdout = sys.stderr
+    app = QCoreApplication(sys.argv[:1])
+    engine = LauncherEngine(load_settings(), max_concurrent=max(args.jobs, 1))
+    try:
+        load_catalog(engine, args.offline)
+        return args.run(engine, args)
+    finally:
+        engine.shutdown()
+        QThreadPool.globalInstance().waitForDone()
@@ -0,0 +1,29 @@
+from PyQt5.QtWidgets import QTableView, QAbstractItemView, QHeaderView
+from PyQt5.QtCore import QEvent
+
+
+class GameListView(QTableView):
+    # A single-column table styled as a list. QListView visits every row of the
+    # model on each relayout; fixed-height table rows are laid out arithmetically,
+    # which keeps filtering large catalogs cheap.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.update_row_height()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.update_row_height()
+
+    def update_row_height(self):
+        self.verticalHeader().setDefaultSectionSize(max(self.fontMetrics().height(), self.iconSize().height()) + 12)
@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from src.extraction import STAGING_FOLDER, ExtractionCanceled, member_target, move_into_place
+from src.streaming import ProgressReader, StreamingNotSupported, read_zip_directory, stream_zip_members
+from src.verify import hash_file
+
+INSTALLED_MANIFEST_FILE = "installed_manifest.alauncher"
+
+
+class DeltaNotPossible(Exception):
+    pass
+
+
+def fetch_manifest(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def load_installed_manifest(game_folder):
+    try:
+        with open(os.path.join(game_folder, INSTALLED_MANIFEST_FILE), "r") as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_installed_manifest(game_folder, manifest):
+    with open(os.path.join(game_folder, INSTALLED_MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+
+def changed_files(manifest, game_folder, installed_manifest=None):
+    # Files recorded in the installed manifest are trusted by hash, others are
+    # only hashed when their size already matches.
+    known_hashes = {}
+    if installed_manifest is not None:
+        known_hashes = {entry["path"]: entry["sha256"] for entry in installed_manifest["files"]}
+    changed = []
+    for entry in manifest["files"]:
+        target = member_target(game_folder, entry["path"])
+        if target is None:
+            continue
+        if not os.path.isfile(target) or os.path.getsize(target) != entry["size"]:
+            changed.append(entry)
+        elif entry["path"] in known_hashes:
+            if known_hashes[entry["path"]] != entry["sha256"]:
+                changed.append(entry)
+        elif hash_file(target) != entry["sha256"]:
+            changed.append(entry)
+    return changed
+
+
+def removed_files(manifest, installed_manifest=None):
+    # Only files the previous manifest shipped are removed, never saves or configs.
+    if installed_manifest is None:
+        return []
+    current_paths = {entry["path"] for entry in manifest["files"]}
+    return [entry["path"] for entry in installed_manifest["files"] if entry["path"] not in current_paths]
+
+
+def download_manifest_file(url, target, report, should_stop, timeout=30):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with urllib.request.urlopen(url, timeout=timeout) as response, open(target, "wb") as target_file:
+        while True:
+            if should_stop():
+                raise ExtractionCanceled()
+            chunk = response.read(1 << 20)
+            if not chunk:
+                break
+            target_file.write(chunk)
+            report(len(chunk))
+
+
+def zip_members_by_name(archive_url, timeout=30):
+    infos, total = read_zip_directory(archive_url, timeout)
+    infos = sorted(infos, key=lambda info: info.header_offset)
+    members = {}
+    for position, info in enumerate(infos):
+        end = infos[position + 1].header_offset - 1 if position + 1 < len(infos) else total - 1
+        members[info.filename] = (info, end)
+    return members
+
+
+def fetch_zip_member(archive_url, info, end, staging, should_stop, timeout=30):
+    request = urllib.request.Request(archive_url)
+    request.add_header("Range", f"bytes={info.header_offset}-{end}")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206:
+            raise DeltaNotPossible("Server does not serve byte ranges of the archive")
+        reader = ProgressReader(response, 0, None, should_stop, position=info.header_offset)
+        stream_zip_members(reader, [info], staging)
+
+
+def fetch_files(entries, manifest_url, archive_url, game_folder, progress_callback=None, should_stop=None,
+                timeout=30):
+    # Fetches single files of a game into a staging folder and moves them into
+    # place once all of them arrived: from the entry's own URL (relative to the
+    # manifest) or as a zip member read with a Range request.
+    should_stop = should_stop or (lambda: None)
+    total = sum(entry["size"] for entry in entries)
+    done = [0]
+
+    def report(size):
+        done[0] += size
+        if progress_callback is not None:
+            progress_callback(done[0], total)
+
+    staging = os.path.join(game_folder, STAGING_FOLDER)
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+    members = None
+    try:
+        for entry in entries:
+            if should_stop():
+                raise ExtractionCanceled()
+            target = member_target(staging, entry["path"])
+            if "url" in entry:
+                download_manifest_file(urllib.parse.urljoin(manifest_url, entry["url"]), target, report, should_stop,
+                                       timeout)
+            else:
+                if members is None:
+                    try:
+                        members = zip_members_by_name(archive_url, timeout)
+                    except StreamingNotSupported as e:
+                        raise DeltaNotPossible(str(e))
+                if entry["path"] not in members:
+                    raise DeltaNotPossible(f"{entry['path']} is not in the game archive")
+                info, end = members[entry["path"]]
+                fetch_zip_member(archive_url, info, end, staging, should_stop, timeout)
+                report(entry["size"])
+            if "sha256" in entry and hash_file(target) != entry["sha256"]:
+                raise ValueError(f"Downloaded {entry['path']} does not match the manifest")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    move_into_place(staging, game_folder)
+
+
+def delta_update(manifest_url, archive_url, game_folder, progress_callback=None, should_stop=None, timeout=30):
+    # Brings an installed game up to the manifest: changed files come from their
+    # own URL or, failing that, as single zip members fetched with Range requests.
+    should_stop = should_stop or (lambda: None)
+    try:
+        manifest = fetch_manifest(manifest_url, timeout)
+    except (urllib.error.URLError, ValueError) as e:
+        raise DeltaNotPossible(f"Can't read the file manifest: {e}")
+    installed_manifest = load_installed_manifest(game_folder)
+    changed = changed_files(manifest, game_folder, installed_manifest)
+    removed = removed_files(manifest, installed_manifest)
+    total = sum(entry["size"] for entry in changed)
+    print(f"Updating {len(changed)} changed files ({total} bytes), removing {len(removed)}")
+    fetch_files(changed, manifest_url, archive_url, game_folder, progress_callback, should_stop, timeout)
+    for path in removed:
+        target = member_target(game_folder, path)
+        if target is not None and os.path.isfile(target):
+            os.remove(target)
+    save_installed_manifest(game_folder, manifest)
+    if progress_callback is not None:
+        progress_callback(total, total)
+    return game_folder
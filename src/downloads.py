@@ -0,0 +1,645 @@
+import http.client
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal
+
+from src.metrics import metrics
+from src.scheduler import DOWNLOAD, scheduler
+from src.workers import Worker
+
+PROGRESS_INTERVAL = 0.1
+SEGMENT_STATE_INTERVAL = 1.0
+SEGMENT_MIN_SIZE = 8 << 20
+STALL_WINDOW = 10
+STALL_MIN_RATE = 16 << 10
+
+
+class DownloadStopped(Exception):
+    def __init__(self, reason):
+        super().__init__(f"Download stopped ({reason})")
+        self.reason = reason
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class DownloadStalled(ConnectionError):
+    pass
+
+
+def part_path_for(local_path):
+    return local_path + ".part"
+
+
+def validator_path_for(part_path):
+    return part_path + ".alauncher"
+
+
+def segments_path_for(part_path):
+    return part_path + ".segments.alauncher"
+
+
+def remove_partial_download(local_path):
+    part_path = part_path_for(local_path)
+    for path in (part_path, validator_path_for(part_path), segments_path_for(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    # download_file made the game folder for the .part alone. Left empty, it would
+    # still offer Uninstall and Open folder, which only check that it exists.
+    folder = os.path.dirname(local_path)
+    if folder and os.path.isdir(folder) and not os.listdir(folder):
+        os.rmdir(folder)
+
+
+def read_validator(part_path):
+    try:
+        with open(validator_path_for(part_path), "r") as validator_file:
+            return validator_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def validator_from(response):
+    # If-Range only accepts a strong ETag or a Last-Modified date.
+    etag = response.headers.get("ETag")
+    return etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+
+
+def write_validator(part_path, response):
+    with open(validator_path_for(part_path), "w") as validator_file:
+        validator_file.write(validator_from(response) or "")
+
+
+def download_to_part(url, part_path, progress_callback=None, should_stop=None, chunk_size=1 << 16, timeout=30,
+                     min_rate=0, received=None):
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+        validator = read_validator(part_path)
+        if validator:
+            request.add_header("If-Range", validator)
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset and not os.path.exists(segments_path_for(part_path)):
+            # Range not satisfiable: the appended .part file already holds the whole file.
+            content_range = e.headers.get("Content-Range", "")
+            if content_range.endswith(f"/{offset}"):
+                return
+            os.remove(part_path)
+            return download_to_part(url, part_path, progress_callback, should_stop, chunk_size, timeout, min_rate,
+                                    received)
+        raise
+
+    with response:
+        if response.status != 206:
+            offset = 0
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length else 0
+        write_validator(part_path, response)
+
+        downloaded = offset
+        last_report = 0
+        window_start, window_bytes, window_waited = time.monotonic(), downloaded, scheduler.waited_seconds()
+        with open(part_path, "ab" if offset else "wb") as part_file:
+            while True:
+                reason = should_stop() if should_stop is not None else None
+                if reason:
+                    raise DownloadStopped(reason)
+                # read1 returns what has arrived, so a slow source is noticed between chunks.
+                chunk = response.read1(chunk_size)
+                if not chunk:
+                    break
+                part_file.write(chunk)
+                downloaded += len(chunk)
+                if received is not None:
+                    received[0] += len(chunk)
+                now = time.monotonic()
+                if progress_callback is not None and now - last_report >= PROGRESS_INTERVAL:
+                    progress_callback(downloaded, total)
+                    last_report = now
+                if min_rate and now - window_start >= STALL_WINDOW:
+                    # Time held back by a bandwidth limit is not a stall.
+                    waited = scheduler.waited_seconds()
+                    if downloaded - window_bytes < min_rate * (now - window_start - (waited - window_waited)):
+                        raise DownloadStalled(f"Download stalled at {downloaded} bytes")
+                    window_start, window_bytes, window_waited = now, downloaded, waited
+
+    if total and downloaded < total:
+        raise ConnectionError(f"Connection closed after {downloaded} of {total} bytes")
+    if progress_callback is not None:
+        progress_callback(downloaded, total or downloaded)
+
+
+def probe_ranges(url, timeout=30):
+    # Returns (total size, validator) when the server serves byte ranges, else None.
+    request = urllib.request.Request(url)
+    request.add_header("Range", "bytes=0-0")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206 or response.headers.get("Accept-Ranges", "bytes").lower() == "none":
+            return None
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if not total.isdigit():
+            return None
+        return int(total), validator_from(response)
+
+
+def plan_segments(total, connections):
+    segment_size = -(-total // connections)
+    return [[start, min(start + segment_size, total) - 1, 0] for start in range(0, total, segment_size)]
+
+
+def load_segments(part_path, total, validator):
+    try:
+        with open(segments_path_for(part_path), "r") as segments_file:
+            state = json.load(segments_file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if state.get("total") != total or state.get("validator") != validator:
+        return None
+    if not os.path.exists(part_path) or os.path.getsize(part_path) != total:
+        return None
+    return state["segments"]
+
+
+def saved_segments(part_path):
+    # (total, validator) of an unfinished segmented download, None if its state is unusable.
+    try:
+        with open(segments_path_for(part_path), "r") as segments_file:
+            state = json.load(segments_file)
+        total = state["total"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+    if not os.path.exists(part_path) or os.path.getsize(part_path) != total:
+        return None
+    return total, state.get("validator")
+
+
+def save_segments(part_path, total, validator, segments):
+    with open(segments_path_for(part_path), "w") as segments_file:
+        json.dump({"total": total, "validator": validator, "segments": segments}, segments_file)
+
+
+def download_segment(url, part_path, segment, validator, should_stop, retries, timeout, min_rate=0,
+                     chunk_size=1 << 16):
+    # segment is [first byte, last byte, bytes done] and is updated in place.
+    # A stall isn't retried here, download_file moves on to the next mirror.
+    attempt = 0
+    while True:
+        start, end, done = segment
+        if start + done > end:
+            return
+        request = urllib.request.Request(url)
+        request.add_header("Range", f"bytes={start + done}-{end}")
+        if validator:
+            request.add_header("If-Range", validator)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response, open(part_path, "r+b", buffering=0) as part_file:
+                if response.status != 206:
+                    raise RangeNotSupported(f"Server answered a Range request with {response.status}")
+                part_file.seek(start + done)
+                window_start, window_bytes, window_waited = time.monotonic(), segment[2], scheduler.waited_seconds()
+                while start + segment[2] <= end:
+                    reason = should_stop()
+                    if reason:
+                        raise DownloadStopped(reason)
+                    chunk = response.read1(min(chunk_size, end - start - segment[2] + 1))
+                    if not chunk:
+                        break
+                    part_file.write(chunk)
+                    segment[2] += len(chunk)
+                    now = time.monotonic()
+                    if min_rate and now - window_start >= STALL_WINDOW:
+                        waited = scheduler.waited_seconds()
+                        if segment[2] - window_bytes < min_rate * (now - window_start - (waited - window_waited)):
+                            raise DownloadStalled(f"Segment {start}-{end} stalled at {segment[2]} bytes")
+                        window_start, window_bytes, window_waited = now, segment[2], waited
+            if start + segment[2] <= end:
+                raise ConnectionError(f"Segment {start}-{end} ended early")
+            return
+        except urllib.error.HTTPError as e:
+            if e.code < 500 or attempt >= retries:
+                raise
+        except DownloadStalled:
+            raise
+        except (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError):
+            if attempt >= retries:
+                raise
+        attempt += 1
+        wait_before_retry(attempt, should_stop)
+
+
+def download_segmented(url, part_path, total, validator, connections, progress_callback=None, should_stop=None,
+                       retries=5, timeout=30, min_rate=0, received=None):
+    segments = load_segments(part_path, total, validator)
+    if segments is None:
+        with open(part_path, "wb") as part_file:
+            part_file.truncate(total)
+        segments = plan_segments(total, connections)
+        save_segments(part_path, total, validator, segments)
+    resumed_from = sum(segment[2] for segment in segments)
+
+    aborted = []
+
+    def segment_should_stop():
+        if aborted:
+            return "abort"
+        return should_stop() if should_stop is not None else None
+
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        futures = [executor.submit(scheduler.bind(download_segment), url, part_path, segment, validator, segment_should_stop,
+                                   retries, timeout, min_rate) for segment in segments]
+        last_save = time.monotonic()
+        try:
+            while True:
+                done, pending = concurrent.futures.wait(futures, timeout=PROGRESS_INTERVAL,
+                                                        return_when=concurrent.futures.FIRST_EXCEPTION)
+                if progress_callback is not None:
+                    progress_callback(sum(segment[2] for segment in segments), total)
+                if time.monotonic() - last_save >= SEGMENT_STATE_INTERVAL:
+                    save_segments(part_path, total, validator, segments)
+                    last_save = time.monotonic()
+                if not pending or any(future.exception() is not None for future in done):
+                    break
+        finally:
+            # One failed segment stops the others; the whole download is retried from the saved state.
+            aborted.append(True)
+    save_segments(part_path, total, validator, segments)
+    if received is not None:
+        received[0] += sum(segment[2] for segment in segments) - resumed_from
+
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    errors = [error for error in errors if not (isinstance(error, DownloadStopped) and error.reason == "abort")]
+    if errors:
+        raise errors[0]
+
+
+def wait_before_retry(attempt, should_stop):
+    metrics.count("download_retries_total")
+    retry_at = time.monotonic() + min(2 ** attempt, 30)
+    while time.monotonic() < retry_at:
+        reason = should_stop() if should_stop is not None else None
+        if reason:
+            raise DownloadStopped(reason)
+        time.sleep(0.2)
+
+
+def download_file(url, local_path, progress_callback=None, should_stop=None, retries=5, timeout=30, connections=1,
+                  mirrors=None, received=None):
+    # Downloads into <local_path>.part and resumes it with a Range request after
+    # a dropped connection, a pause or a restart of the launcher. With several
+    # connections, large files are fetched as parallel byte-range segments when
+    # the server supports it. With a MirrorList, a failing or stalled source is
+    # replaced by the next mirror and the download resumes from there.
+    # received is a one-item list that counts the bytes fetched by this call.
+    folder = os.path.dirname(local_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    part_path = part_path_for(local_path)
+    if mirrors is not None:
+        url = mirrors.current()
+    can_fail_over = mirrors is not None and mirrors.has_alternatives()
+    min_rate = 0
+    if can_fail_over:
+        # With somewhere else to go, a source that stops sending for a while counts as stalled.
+        min_rate = STALL_MIN_RATE
+        timeout = min(timeout, STALL_WINDOW)
+    if received is None:
+        received = [0]
+    started = time.monotonic()
+    mirror_received = received[0]
+
+    ranges = None
+    if os.path.exists(segments_path_for(part_path)):
+        # A segmented .part is allocated to full size up front, only the saved
+        # segments tell what it holds: carry on from them or start over.
+        ranges = saved_segments(part_path)
+        if ranges is None:
+            remove_partial_download(local_path)
+            os.makedirs(folder or ".", exist_ok=True)
+    elif connections > 1 and not os.path.exists(part_path):
+        try:
+            ranges = probe_ranges(url, timeout)
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            print("Could not probe for byte-range support, using a single connection:", e)
+        if ranges is not None and ranges[0] < SEGMENT_MIN_SIZE:
+            ranges = None
+
+    attempt = 0
+    while True:
+        try:
+            if ranges is not None:
+                # With a mirror to fall back on, a failing segment goes to the next
+                # mirror at once instead of retrying the same source.
+                download_segmented(url, part_path, ranges[0], ranges[1], connections, progress_callback, should_stop,
+                                   0 if can_fail_over else retries, timeout, min_rate, received)
+            else:
+                download_to_part(url, part_path, progress_callback, should_stop, timeout=timeout, min_rate=min_rate,
+                                 received=received)
+            break
+        except RangeNotSupported as e:
+            print("Falling back to a single connection:", e)
+            remove_partial_download(local_path)
+            os.makedirs(folder or ".", exist_ok=True)
+            ranges = None
+            continue
+        except urllib.error.HTTPError as e:
+            # A mirror without the file is skipped, a single source fails right away.
+            if (e.code < 500 and not can_fail_over) or attempt >= retries:
+                raise
+            error = e
+        except (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError) as e:
+            if attempt >= retries:
+                raise
+            error = e
+        if can_fail_over and mirrors.fail_over():
+            print(f"Download from {url} failed ({error}), switching to {mirrors.current()}")
+            url = mirrors.current()
+            started = time.monotonic()
+            mirror_received = received[0]
+            continue
+        if isinstance(error, urllib.error.HTTPError) and error.code < 500:
+            raise error
+        if mirrors is not None:
+            url = mirrors.current()
+        attempt += 1
+        print(f"Download interrupted ({error}), retrying {attempt}/{retries}")
+        wait_before_retry(attempt, should_stop)
+
+    if mirrors is not None:
+        mirrors.record_transfer(received[0] - mirror_received, time.monotonic() - started)
+    os.replace(part_path, local_path)
+    for path in (validator_path_for(part_path), segments_path_for(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    return local_path
+
+
+def run_download_job(job, progress_callback=None, should_stop=None, connections=1, archive_cache=None,
+                     mirror_stats=None):
+    # Archive handling is imported on first use, it is not needed to show the launcher.
+    from src.delta import DeltaNotPossible, delta_update
+    from src.streaming import StreamingNotSupported, stream_install
+    started = time.monotonic()
+    mirrors = None
+    url = job.url
+    if mirror_stats is not None and len(job.mirrors) > 1:
+        from src.mirrors import MirrorList
+        mirrors = MirrorList(mirror_stats.rank(job.mirrors), mirror_stats)
+        url = mirrors.current()
+    last_done = [0]
+
+    def report(done, total):
+        last_done[0] = done
+        if progress_callback is not None:
+            progress_callback(done, total)
+
+    if job.repair:
+        from src.verify import VerifyNotPossible, repair_game
+        try:
+            return repair_game(job.manifest_url, url, os.path.dirname(job.local_path), report, should_stop,
+                               on_phase=lambda phase: setattr(job, "phase", phase))
+        except (DeltaNotPossible, VerifyNotPossible) as e:
+            print("Can't repair single files, downloading the whole game:", e)
+            job.repair = False
+            job.manifest_url = None
+            job.phase = "download"
+
+    if job.manifest_url is not None:
+        try:
+            result = delta_update(job.manifest_url, url, os.path.dirname(job.local_path), report, should_stop)
+            record_download("delta", started, last_done[0])
+            return result
+        except DeltaNotPossible as e:
+            print("Can't update from the file manifest, downloading the whole game:", e)
+            job.manifest_url = None
+    identity = archive_cache.identify(url, job.sha256) if archive_cache is not None else None
+    if identity is not None and archive_cache.fetch(identity, job.local_path, report, should_stop):
+        job.stream_to = None
+        remove_partial_download(job.local_path)
+        return job.local_path
+    # Streamed installs can't resume mid-archive, a pause restarts them from the beginning.
+    if job.stream_to is not None:
+        try:
+            result = stream_install(url, job.stream_to, report, should_stop)
+            record_download("stream", started, last_done[0])
+            return result
+        except StreamingNotSupported as e:
+            print("Can't install while downloading, downloading the archive first:", e)
+            job.stream_to = None
+    part_path = part_path_for(job.local_path)
+    received = [0]
+    result = download_file(url, job.local_path, report, should_stop, connections=connections, mirrors=mirrors,
+                           received=received)
+    record_download("archive", started, received[0])
+    sha256 = None
+    if job.sha256:
+        from src.extraction import ExtractionCanceled
+        from src.verify import hash_file
+        try:
+            sha256 = hash_file(result, "sha256", should_stop=should_stop)
+        except ExtractionCanceled:
+            # Stopped while hashing: a complete .part is checked again when the download resumes.
+            os.replace(result, part_path)
+            raise DownloadStopped(should_stop())
+        if sha256 != job.sha256.lower():
+            os.remove(result)
+            remove_partial_download(job.local_path)
+            raise ValueError(f"Downloaded archive does not match its SHA-256 ({sha256})")
+    if identity is not None:
+        try:
+            archive_cache.store(identity, result, should_stop, sha256)
+        except OSError as e:
+            print("Can't add the archive to the cache:", e)
+    return result
+
+
+def record_download(mode, started, transferred):
+    seconds = time.monotonic() - started
+    metrics.observe("download_seconds", seconds, mode=mode)
+    metrics.count("download_bytes_total", transferred, mode=mode)
+    if seconds > 0:
+        metrics.observe("download_bytes_per_second", transferred / seconds, mode=mode)
+
+
+class DownloadJob:
+    def __init__(self, game_info, url, local_path, stream_to=None, manifest_url=None, sha256=None, mirrors=None,
+                 repair=False):
+        self.game_info = game_info
+        self.url = url
+        self.mirrors = mirrors or [url]
+        self.local_path = local_path
+        self.stream_to = stream_to
+        self.manifest_url = manifest_url
+        self.sha256 = sha256
+        self.repair = repair
+        self.phase = "download"
+        self.state = "queued"
+        self.stop_reason = None
+        self.downloaded = 0
+        self.total = 0
+
+    def installs_in_place(self):
+        return self.stream_to is not None or self.manifest_url is not None or self.repair
+
+
+class DownloadManager(QObject):
+    download_progress = pyqtSignal(object, object, object)
+    download_finished = pyqtSignal(object)
+    download_failed = pyqtSignal(object, str)
+    download_state_changed = pyqtSignal(object)
+
+    def __init__(self, max_concurrent=2, connections=1, archive_cache=None, mirror_stats=None, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self.connections = connections
+        self.archive_cache = archive_cache
+        self.mirror_stats = mirror_stats
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_concurrent)
+        self.jobs = {}
+        self.queue = []
+        self.suspended = False
+        self.suspended_ids = set()
+
+    def job_for(self, game_id):
+        return self.jobs.get(game_id)
+
+    def enqueue(self, game_info, url, local_path, stream_to=None, manifest_url=None, sha256=None, mirrors=None,
+                repair=False):
+        game_id = game_info["ID"]
+        job = self.jobs.get(game_id)
+        if job is not None:
+            if job.state == "paused":
+                self.resume(game_id)
+            return job
+        job = DownloadJob(game_info, url, local_path, stream_to, manifest_url, sha256, mirrors, repair)
+        self.jobs[game_id] = job
+        self.queue.append(game_id)
+        self.download_state_changed.emit(game_id)
+        self.start_next()
+        return job
+
+    def pause(self, game_id):
+        job = self.jobs.get(game_id)
+        if job is None or job.state == "paused":
+            return
+        if job.state == "downloading":
+            job.stop_reason = "pause"
+            return
+        self.queue.remove(game_id)
+        job.state = "paused"
+        self.download_state_changed.emit(game_id)
+
+    def resume(self, game_id):
+        job = self.jobs.get(game_id)
+        if job is None or job.state != "paused":
+            return
+        job.state = "queued"
+        job.stop_reason = None
+        self.queue.append(game_id)
+        self.download_state_changed.emit(game_id)
+        self.start_next()
+
+    def cancel(self, game_id):
+        job = self.jobs.get(game_id)
+        if job is None:
+            return
+        if job.state == "downloading":
+            job.stop_reason = "cancel"
+            return
+        if game_id in self.queue:
+            self.queue.remove(game_id)
+        del self.jobs[game_id]
+        remove_partial_download(job.local_path)
+        self.download_state_changed.emit(game_id)
+
+    def set_suspended(self, suspended):
+        # While suspended nothing starts and running downloads are paused; only
+        # the ones paused here are resumed afterwards. A download whose worker
+        # hasn't stopped yet is queued again by on_failed.
+        self.suspended = suspended
+        if suspended:
+            for game_id, job in self.jobs.items():
+                if job.state == "downloading" and job.stop_reason is None:
+                    job.stop_reason = "suspend"
+            return
+        for game_id in self.suspended_ids:
+            self.resume(game_id)
+        self.suspended_ids.clear()
+        self.start_next()
+
+    def shutdown(self):
+        # Keep .part files of running downloads so they resume on next start.
+        for job in self.jobs.values():
+            if job.state == "downloading":
+                job.stop_reason = "pause"
+        self.queue.clear()
+        self.pool.waitForDone()
+
+    def start_next(self):
+        if self.suspended:
+            return
+        running = sum(1 for job in self.jobs.values() if job.state == "downloading")
+        while self.queue and running < self.max_concurrent:
+            game_id = self.queue.pop(0)
+            job = self.jobs[game_id]
+            job.state = "downloading"
+            worker = Worker(scheduler.bind(run_download_job, DOWNLOAD), job, should_stop=lambda job=job: job.stop_reason,
+                            connections=self.connections, archive_cache=self.archive_cache,
+                            mirror_stats=self.mirror_stats)
+            worker.kwargs["progress_callback"] = worker.signals.progress.emit
+            worker.signals.progress.connect(lambda downloaded, total, game_id=game_id:
+                                            self.on_progress(game_id, downloaded, total))
+            worker.signals.finished.connect(lambda local_path, game_id=game_id: self.on_finished(game_id))
+            worker.signals.failed.connect(lambda error, game_id=game_id: self.on_failed(game_id, error))
+            self.pool.start(worker)
+            running += 1
+            self.download_state_changed.emit(game_id)
+
+    def on_progress(self, game_id, downloaded, total):
+        job = self.jobs.get(game_id)
+        if job is None:
+            return
+        job.downloaded = downloaded
+        job.total = total
+        self.download_progress.emit(game_id, downloaded, total)
+
+    def on_finished(self, game_id):
+        job = self.jobs.pop(game_id)
+        self.download_state_changed.emit(game_id)
+        self.download_finished.emit(job)
+        self.start_next()
+
+    def on_failed(self, game_id, error):
+        job = self.jobs[game_id]
+        if job.stop_reason in ("pause", "suspend"):
+            if job.installs_in_place():
+                remove_partial_download(job.local_path)
+            if job.stop_reason == "suspend" and not self.suspended:
+                # The game exited before this download had stopped.
+                job.state = "queued"
+                self.queue.append(game_id)
+            else:
+                if job.stop_reason == "suspend":
+                    self.suspended_ids.add(game_id)
+                job.state = "paused"
+            job.stop_reason = None
+        elif job.stop_reason == "cancel":
+            del self.jobs[game_id]
+            remove_partial_download(job.local_path)
+        else:
+            # The .part file is kept, downloading the game again resumes it.
+            del self.jobs[game_id]
+            print("Error downloading game:", error)
+            self.download_failed.emit(game_id, error)
+        self.download_state_changed.emit(game_id)
+        self.start_next()
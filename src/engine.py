@@ -0,0 +1,234 @@
+import os
+import sys
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from src.archive_cache import ArchiveCache
+from src.catalog import CATALOG_URL, CatalogService
+from src.downloads import DownloadManager, part_path_for
+from src.extraction import ExtractionManager
+from src.filesystem import FileSystemService
+from src.install_state import InstallState
+from src.metrics import metrics
+from src.mirrors import MirrorStats, expand_mirrors
+from src.scheduler import scheduler
+from src.settings import load_settings
+from src.supervisor import GameSupervisor
+from src.updates import UpdateChecker
+
+PLATFORM = "win" if sys.platform == "win32" else "linux"
+
+
+class LauncherEngine(QObject):
+    # Catalog, install, update and uninstall logic without any widgets. The
+    # launcher window and the command line both drive it through these signals.
+    catalog_changed = pyqtSignal(object)
+    install_progress = pyqtSignal(object, object, object, str)
+    install_finished = pyqtSignal(object)
+    install_failed = pyqtSignal(object, str)
+
+    def __init__(self, settings=None, max_concurrent=2, parent=None):
+        super().__init__(parent)
+        self.settings = settings or load_settings()
+        metrics.configure(self.settings["metrics"], prometheus_path=self.settings["metrics_prometheus_path"])
+        scheduler.configure(self.settings["bandwidth_limits"], self.settings["disk_jobs"])
+        self.games = []
+        self.games_by_id = {}
+        self.install_state = InstallState(parent=self)
+        self.update_checker = UpdateChecker(parent=self)
+        self.install_state.changed.connect(self.check_for_updates)
+        self.filesystem = FileSystemService(self.install_state.games_folder, parent=self)
+        self.install_state.changed.connect(self.sync_disk_usage)
+        self.sync_disk_usage()
+        self.mirror_stats = MirrorStats()
+        self.catalog_service = CatalogService(expand_mirrors([CATALOG_URL], self.settings["mirrors"]),
+                                              mirror_stats=self.mirror_stats, parent=self)
+        self.catalog_service.catalog_changed.connect(self.set_catalog)
+        self.archive_cache = None
+        if self.settings["archive_cache"]:
+            self.archive_cache = ArchiveCache(self.settings["archive_cache_path"],
+                                              self.settings["archive_cache_budget_mb"] << 20)
+        self.download_manager = DownloadManager(max_concurrent=max_concurrent,
+                                                connections=self.settings["download_connections"],
+                                                archive_cache=self.archive_cache, mirror_stats=self.mirror_stats,
+                                                parent=self)
+        self.download_manager.download_progress.connect(self.on_download_progress)
+        self.download_manager.download_finished.connect(self.on_download_finished)
+        self.download_manager.download_failed.connect(self.install_failed)
+        self.extraction_manager = ExtractionManager(processes=self.settings["extraction_processes"], parent=self)
+        self.extraction_manager.extraction_progress.connect(
+            lambda game_id, done, total: self.install_progress.emit(game_id, done, total, "extract"))
+        self.extraction_manager.extraction_finished.connect(self.on_extraction_finished)
+        self.extraction_manager.extraction_failed.connect(self.install_failed)
+        self.supervisor = GameSupervisor(parent=self)
+        self.supervisor.running_changed.connect(self.on_game_running_changed)
+
+    def load_local_catalog(self):
+        data = self.catalog_service.load_local()
+        if data is not None:
+            self.set_catalog(data)
+        return data
+
+    def set_catalog(self, data):
+        self.games = data["games"]
+        self.games_by_id = {game["ID"]: game for game in self.games}
+        self.check_for_updates()
+        self.catalog_changed.emit(data)
+
+    def game_by_id(self, game_id):
+        return self.games_by_id.get(game_id)
+
+    def check_for_updates(self):
+        self.update_checker.check(self.games, self.install_state)
+
+    def sync_disk_usage(self):
+        self.filesystem.sync(self.install_state.games)
+
+    def game_folder(self, game_id):
+        return self.install_state.game_folder(game_id)
+
+    def is_installed(self, game_id):
+        return self.install_state.is_installed(game_id)
+
+    def installed_version(self, game_id):
+        return self.install_state.installed_version(game_id)
+
+    def is_busy(self, game_id):
+        return self.download_manager.job_for(game_id) is not None \
+            or self.extraction_manager.job_for(game_id) is not None
+
+    def install(self, game_info):
+        # Installs or updates a game: a manifest delta for installed games that
+        # have one, otherwise the archive (streamed when enabled) and extraction.
+        game_id = game_info["ID"]
+        download_link_key = f"download_link_{PLATFORM}"
+        if download_link_key not in game_info:
+            self.install_failed.emit(game_id, f"No download for {PLATFORM}")
+            return False
+        if self.filesystem.is_deleting_in_place(game_id):
+            self.install_failed.emit(game_id, "The game's old files are still being deleted")
+            return False
+        download_url = game_info[download_link_key]
+        game_folder = self.game_folder(game_id)
+        game_file_path = os.path.join(game_folder, os.path.basename(download_url))
+
+        if os.path.exists(game_file_path):
+            self.extraction_manager.start(game_info, game_file_path, game_folder)
+            return True
+        print("Downloading from:", download_url)
+        print("Saving to:", game_file_path)
+        stream_to = None
+        manifest_url = None
+        manifest_key = f"manifest_{PLATFORM}"
+        if manifest_key in game_info and self.is_installed(game_id):
+            manifest_url = game_info[manifest_key]
+        elif self.settings["streaming_install"] and self.can_stream(download_url) \
+                and not os.path.exists(part_path_for(game_file_path)):
+            stream_to = game_folder
+        self.download_manager.enqueue(game_info, download_url, game_file_path, stream_to, manifest_url,
+                                      game_info.get(f"sha256_{PLATFORM}"), self.mirrors_for(game_info))
+        return True
+
+    def repair(self, game_info):
+        # Re-checks an installed game and fetches only its damaged or missing files.
+        # The catalog only describes its latest version, so an outdated install
+        # is updated instead: checking old files against the new version would
+        # leave a mix of both marked as up to date.
+        game_id = game_info["ID"]
+        if self.installed_version(game_id) != game_info["version"]:
+            print(f"Game {game_id} is not at version {game_info['version']}, updating it instead")
+            return self.install(game_info)
+        download_url = game_info.get(f"download_link_{PLATFORM}")
+        if download_url is None:
+            self.install_failed.emit(game_id, f"No download for {PLATFORM}")
+            return False
+        game_file_path = os.path.join(self.game_folder(game_id), os.path.basename(download_url))
+        self.download_manager.enqueue(game_info, download_url, game_file_path,
+                                      manifest_url=game_info.get(f"manifest_{PLATFORM}"),
+                                      sha256=game_info.get(f"sha256_{PLATFORM}"), mirrors=self.mirrors_for(game_info),
+                                      repair=True)
+        return True
+
+    def mirrors_for(self, game_info):
+        return expand_mirrors([game_info[f"download_link_{PLATFORM}"]] + game_info.get(f"mirrors_{PLATFORM}", []),
+                              self.settings["mirrors"])
+
+    def can_stream(self, download_url):
+        from src.streaming import stream_format_for
+        return stream_format_for(download_url) is not None
+
+    def on_download_progress(self, game_id, done, total):
+        download_job = self.download_manager.job_for(game_id)
+        phase = download_job.phase if download_job is not None else "download"
+        self.install_progress.emit(game_id, done, total, phase)
+
+    def on_download_finished(self, download_job):
+        game_info = download_job.game_info
+        local_path = download_job.local_path
+        game_folder = os.path.dirname(local_path)
+        if download_job.installs_in_place():
+            self.on_extraction_finished(game_info, game_folder)
+        elif local_path.endswith(".zip"):
+            print("Extracting the game")
+            self.extraction_manager.start(game_info, local_path, game_folder)
+        else:
+            self.on_extraction_finished(game_info, game_folder)
+
+    def on_extraction_finished(self, game_info, game_folder):
+        self.install_state.mark_installed(game_info["ID"], game_info["version"])
+        self.filesystem.rescan(game_info["ID"], full=True)
+        self.install_finished.emit(game_info["ID"])
+
+    def cancel(self, game_id):
+        if self.extraction_manager.job_for(game_id) is not None:
+            self.extraction_manager.cancel(game_id)
+        else:
+            self.download_manager.cancel(game_id)
+
+    def uninstall(self, game_id):
+        # The folder is moved to the trash at once, its files are deleted in the background.
+        game_folder = self.game_folder(game_id)
+        self.filesystem.trash(game_id, game_folder)
+        print(f"Game uninstalled: {game_folder}")
+        self.install_state.mark_uninstalled(game_id)
+
+    def verify(self, game_id, progress_callback=None, should_stop=None):
+        # Hashes the installed files against the published file manifest or the
+        # archive's CRC-32s. An outdated install can only be checked against the
+        # manifest of its last delta update, the catalog describes the new version.
+        from src.delta import load_installed_manifest
+        from src.verify import VerifyNotPossible, expected_files, find_damaged_files
+        game_info = self.game_by_id(game_id)
+        game_folder = self.game_folder(game_id)
+        problems = []
+        if not os.path.isdir(game_folder):
+            return ["Game folder is missing"]
+        executable = game_info.get(f"exec_{PLATFORM}") if game_info is not None else None
+        if executable is not None and not os.path.exists(os.path.join(game_folder, executable)):
+            problems.append(f"Executable {executable} is missing")
+        entries = None
+        if game_info is not None and self.installed_version(game_id) == game_info["version"]:
+            try:
+                entries = expected_files(game_info.get(f"manifest_{PLATFORM}"),
+                                         game_info.get(f"download_link_{PLATFORM}"), game_folder)
+            except VerifyNotPossible as e:
+                print(f"Can't check the files of game {game_id}:", e)
+        else:
+            manifest = load_installed_manifest(game_folder)
+            entries = manifest["files"] if manifest is not None else None
+        if entries is not None:
+            for entry, problem in find_damaged_files(game_folder, entries, progress_callback, should_stop):
+                problems.append(f"{entry['path']} {problem}")
+        return problems
+
+    def on_game_running_changed(self, running):
+        # Downloads pause and extractions wait while a game is running.
+        if self.settings["pause_while_playing"]:
+            self.download_manager.set_suspended(running)
+            self.extraction_manager.set_suspended(running)
+
+    def shutdown(self):
+        self.download_manager.shutdown()
+        self.extraction_manager.shutdown()
+        self.filesystem.shutdown()
+        metrics.close()
@@ -0,0 +1,313 @@
+import os
+import shutil
+import time
+
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal
+
+from src.metrics import metrics
+from src.scheduler import scheduler
+from src.workers import Worker
+
+PROGRESS_INTERVAL = 0.1
+PROGRESS_STEP = 1 << 20
+PARALLEL_MIN_SIZE = 256 << 20
+STAGING_FOLDER = ".alauncher-extract"
+
+
+class ExtractionCanceled(Exception):
+    pass
+
+
+def member_target(destination, name):
+    # Same sanitizing as ZipFile.extract(): no drive letters, absolute paths or "..".
+    name = name.replace("\\", "/") if os.sep == "\\" else name
+    name = os.path.splitdrive(name)[1]
+    parts = [part for part in name.split("/") if part not in ("", ".", "..")]
+    return os.path.join(destination, *parts) if parts else None
+
+
+def extract_member(archive, info, destination, report, should_stop, chunk_size=1 << 20):
+    target = member_target(destination, info.filename)
+    if target is None:
+        return
+    if info.is_dir():
+        os.makedirs(target, exist_ok=True)
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with archive.open(info) as source, open(target, "wb") as target_file:
+        while True:
+            if should_stop():
+                raise ExtractionCanceled()
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            target_file.write(chunk)
+            report(len(chunk))
+
+
+_pool_progress_queue = None
+_pool_stop_event = None
+
+
+def init_pool_worker(progress_queue, stop_event):
+    global _pool_progress_queue, _pool_stop_event
+    _pool_progress_queue = progress_queue
+    _pool_stop_event = stop_event
+
+
+def pool_worker_stopped():
+    return _pool_stop_event.is_set()
+
+
+def pool_worker_progress():
+    # report(size) and flush() for code running in run_in_processes; progress
+    # is batched to keep the queue quiet.
+    pending = [0]
+
+    def report(size):
+        pending[0] += size
+        if pending[0] >= PROGRESS_STEP:
+            _pool_progress_queue.put(pending[0])
+            pending[0] = 0
+
+    def flush():
+        if pending[0]:
+            _pool_progress_queue.put(pending[0])
+            pending[0] = 0
+    return report, flush
+
+
+def run_in_processes(fn, arg_lists, total, progress_callback, should_stop):
+    # Calls the module level fn once per argument list, each in its own worker
+    # process, and returns the results in order. The workers are spawned, not
+    # forked: the launcher's threads may hold locks (or Qt and SSL state) that a
+    # forked child would inherit in the middle of use.
+    import concurrent.futures
+    import multiprocessing
+    import queue
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    stop_event = context.Event()
+    done = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(arg_lists), mp_context=context,
+                                                initializer=init_pool_worker,
+                                                initargs=(progress_queue, stop_event)) as executor:
+        futures = [executor.submit(fn, *args) for args in arg_lists]
+        try:
+            while True:
+                finished, pending = concurrent.futures.wait(futures, timeout=PROGRESS_INTERVAL,
+                                                            return_when=concurrent.futures.FIRST_EXCEPTION)
+                while True:
+                    try:
+                        done += progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if progress_callback is not None:
+                    progress_callback(done, total)
+                if should_stop():
+                    raise ExtractionCanceled()
+                if not pending or any(future.exception() is not None for future in finished):
+                    break
+        finally:
+            stop_event.set()
+
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise errors[0]
+    return [future.result() for future in futures]
+
+
+def extract_member_range(zip_path, staging, names):
+    # Runs in a worker process of run_in_processes.
+    import zipfile
+    report, flush = pool_worker_progress()
+    with zipfile.ZipFile(zip_path, "r") as archive:
+        for name in names:
+            extract_member(archive, archive.getinfo(name), staging, report, pool_worker_stopped)
+    flush()
+
+
+def split_members(infos, parts):
+    # Contiguous member ranges of roughly equal uncompressed size.
+    target_size = sum(info.file_size for info in infos) / parts
+    ranges = []
+    current = []
+    current_size = 0
+    for info in infos:
+        current.append(info.filename)
+        current_size += info.file_size
+        if current_size >= target_size and len(ranges) < parts - 1:
+            ranges.append(current)
+            current = []
+            current_size = 0
+    if current:
+        ranges.append(current)
+    return ranges
+
+
+def extract_serial(zip_path, staging, total, progress_callback, should_stop):
+    import zipfile
+    state = {"done": 0, "last_report": 0}
+
+    def report(size):
+        state["done"] += size
+        now = time.monotonic()
+        if progress_callback is not None and now - state["last_report"] >= PROGRESS_INTERVAL:
+            progress_callback(state["done"], total)
+            state["last_report"] = now
+
+    with zipfile.ZipFile(zip_path, "r") as archive:
+        for info in archive.infolist():
+            extract_member(archive, info, staging, report, should_stop)
+
+
+def extract_parallel(zip_path, staging, infos, total, processes, progress_callback, should_stop):
+    run_in_processes(extract_member_range, [(zip_path, staging, names) for names in split_members(infos, processes)],
+                     total, progress_callback, should_stop)
+
+
+def move_into_place(staging, destination):
+    for root, dirs, files in os.walk(staging):
+        target_root = os.path.join(destination, os.path.relpath(root, staging))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            os.replace(os.path.join(root, name), os.path.join(target_root, name))
+    shutil.rmtree(staging)
+
+
+def extract_archive(zip_path, destination, progress_callback=None, should_stop=None, processes=0,
+                    remove_archive=False):
+    # Extracts into a staging folder inside destination and only moves the files
+    # into place once everything is unpacked, so a cancel or an error leaves the
+    # previous install untouched. Progress is reported in uncompressed bytes.
+    import zipfile
+    should_stop = should_stop or (lambda: False)
+    processes = processes or os.cpu_count() or 1
+    with scheduler.disk_job(should_stop):
+        started = time.monotonic()
+        staging = os.path.join(destination, STAGING_FOLDER)
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        os.makedirs(staging)
+
+        try:
+            with zipfile.ZipFile(zip_path, "r") as archive:
+                infos = archive.infolist()
+            total = sum(info.file_size for info in infos)
+            mode = "parallel" if processes > 1 and len(infos) > 1 and total >= PARALLEL_MIN_SIZE else "serial"
+            if mode == "parallel":
+                extract_parallel(zip_path, staging, infos, total, min(processes, len(infos)), progress_callback,
+                                 should_stop)
+            else:
+                extract_serial(zip_path, staging, total, progress_callback, should_stop)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        move_into_place(staging, destination)
+        if remove_archive:
+            os.remove(zip_path)
+    seconds = time.monotonic() - started
+    metrics.observe("extraction_seconds", seconds, mode=mode)
+    if seconds > 0:
+        metrics.observe("extraction_bytes_per_second", total / seconds, mode=mode)
+    if progress_callback is not None:
+        progress_callback(total, total)
+    return destination
+
+
+class ExtractionJob:
+    def __init__(self, game_info, archive_path, destination):
+        self.game_info = game_info
+        self.archive_path = archive_path
+        self.destination = destination
+        self.canceled = False
+        self.done = 0
+        self.total = 0
+
+
+class ExtractionManager(QObject):
+    extraction_progress = pyqtSignal(object, object, object)
+    extraction_finished = pyqtSignal(object, object)
+    extraction_failed = pyqtSignal(object, str)
+    extraction_state_changed = pyqtSignal(object)
+
+    def __init__(self, processes=0, parent=None):
+        super().__init__(parent)
+        self.processes = processes
+        # Extraction is disk-bound and already parallel inside a job, run one job at a time.
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.jobs = {}
+        self.suspended = False
+        self.waiting = []
+
+    def job_for(self, game_id):
+        return self.jobs.get(game_id)
+
+    def start(self, game_info, archive_path, destination):
+        game_id = game_info["ID"]
+        if game_id in self.jobs:
+            return self.jobs[game_id]
+        job = ExtractionJob(game_info, archive_path, destination)
+        self.jobs[game_id] = job
+        if self.suspended:
+            self.waiting.append(game_id)
+        else:
+            self.run(job)
+        self.extraction_state_changed.emit(game_id)
+        return job
+
+    def run(self, job):
+        game_id = job.game_info["ID"]
+        worker = Worker(extract_archive, job.archive_path, job.destination, should_stop=lambda: job.canceled,
+                        processes=self.processes, remove_archive=True)
+        worker.kwargs["progress_callback"] = worker.signals.progress.emit
+        worker.signals.progress.connect(lambda done, total: self.on_progress(game_id, done, total))
+        worker.signals.finished.connect(lambda destination: self.on_finished(game_id))
+        worker.signals.failed.connect(lambda error: self.on_failed(game_id, error))
+        self.pool.start(worker)
+
+    def set_suspended(self, suspended):
+        # A running extraction finishes, new ones wait until resumed.
+        self.suspended = suspended
+        if not suspended:
+            waiting, self.waiting = self.waiting, []
+            for game_id in waiting:
+                self.run(self.jobs[game_id])
+
+    def cancel(self, game_id):
+        job = self.jobs.get(game_id)
+        if job is None:
+            return
+        if game_id in self.waiting:
+            self.waiting.remove(game_id)
+            del self.jobs[game_id]
+            self.extraction_state_changed.emit(game_id)
+            return
+        job.canceled = True
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.canceled = True
+        self.pool.waitForDone()
+
+    def on_progress(self, game_id, done, total):
+        job = self.jobs.get(game_id)
+        if job is None:
+            return
+        job.done = done
+        job.total = total
+        self.extraction_progress.emit(game_id, done, total)
+
+    def on_finished(self, game_id):
+        job = self.jobs.pop(game_id)
+        self.extraction_state_changed.emit(game_id)
+        self.extraction_finished.emit(job.game_info, job.destination)
+
+    def on_failed(self, game_id, error):
+        job = self.jobs.pop(game_id)
+        if not job.canceled:
+            print("Error extracting game:", error)
+            self.extraction_failed.emit(game_id, error)
+        self.extraction_state_changed.emit(game_id)
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from src.scheduler import INTERACTIVE, PREFETCH, scheduler
+from src.workers import run_in_background
+
+FEEDS_FOLDER = "feeds"
+FEED_TTL = 30 * 60
+MAX_ENTRIES = 100
+PREFETCH_INTERVAL = 2000
+
+
+def feed_cache_path(game_id, folder=FEEDS_FOLDER):
+    return os.path.join(folder, f"{game_id}.alauncher")
+
+
+def load_cached_feed(game_id, folder=FEEDS_FOLDER):
+    try:
+        with open(feed_cache_path(game_id, folder), "r") as cache_file:
+            return json.load(cache_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_cached_feed(game_id, cached, folder=FEEDS_FOLDER):
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    path = feed_cache_path(game_id, folder)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as cache_file:
+        json.dump(cached, cache_file)
+    os.replace(temp_path, path)
+
+
+def entry_key(entry):
+    return entry.get("id") or entry.get("link") or entry.get("title")
+
+
+def fetch_feed(game_id, url, folder=FEEDS_FOLDER, timeout=15):
+    # Conditional GET with the stored ETag/Last-Modified; new entries are merged
+    # in front of the cached ones. Returns None when nothing changed. The feed
+    # is fetched with urlopen, not by feedparser, so it goes through the
+    # scheduler in the caller's traffic class like every other request.
+    import feedparser
+    cached = load_cached_feed(game_id, folder)
+    if cached is not None and cached.get("url") != url:
+        cached = None
+    request = urllib.request.Request(url)
+    if cached is not None and cached.get("etag"):
+        request.add_header("If-None-Match", cached["etag"])
+    if cached is not None and cached.get("modified"):
+        request.add_header("If-Modified-Since", cached["modified"])
+    now = time.time()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            headers = {name.lower(): value for name, value in response.headers.items()}
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached is not None:
+            cached["fetched_at"] = now
+            save_cached_feed(game_id, cached, folder)
+            return None
+        raise IOError(f"Can't fetch {url}: HTTP {e.code}")
+    # Relative links in the feed resolve against its URL.
+    headers.setdefault("content-location", url)
+    feed = feedparser.parse(body, response_headers=headers)
+
+    old_entries = cached["entries"] if cached else []
+    known_keys = {entry_key(entry) for entry in old_entries}
+    new_entries = []
+    for entry in feed.entries:
+        entry = {
+            "id": entry.get("id"),
+            "title": entry.get("title", ""),
+            "published": entry.get("published", ""),
+            "link": entry.get("link", ""),
+            "summary": entry.get("summary", ""),
+        }
+        if entry_key(entry) not in known_keys:
+            new_entries.append(entry)
+    updated = {
+        "url": url,
+        "etag": headers.get("etag"),
+        "modified": headers.get("last-modified"),
+        "fetched_at": now,
+        "entries": (new_entries + old_entries)[:MAX_ENTRIES],
+    }
+    save_cached_feed(game_id, updated, folder)
+    return updated if new_entries or cached is None else None
+
+
+class FeedService(QObject):
+    feed_updated = pyqtSignal(object, object)
+    feed_failed = pyqtSignal(object, str)
+
+    def __init__(self, folder=FEEDS_FOLDER, ttl=FEED_TTL, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.ttl = ttl
+        self.feeds = {}
+        self.in_flight = set()
+        self.prefetch_queue = []
+        self.suspended = False
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setInterval(PREFETCH_INTERVAL)
+        self.prefetch_timer.timeout.connect(self.prefetch_next)
+
+    def cached(self, game_id):
+        if game_id not in self.feeds:
+            self.feeds[game_id] = load_cached_feed(game_id, self.folder)
+        return self.feeds[game_id]
+
+    def is_fresh(self, game_id, url):
+        cached = self.cached(game_id)
+        return cached is not None and cached.get("url") == url and time.time() - cached["fetched_at"] < self.ttl
+
+    def refresh(self, game_id, url, force=False, traffic=INTERACTIVE):
+        if game_id in self.in_flight or (not force and self.is_fresh(game_id, url)):
+            return
+        self.in_flight.add(game_id)
+        run_in_background(scheduler.bind(fetch_feed, traffic), game_id, url, self.folder,
+                          on_finished=lambda updated: self.on_fetch_finished(game_id, updated),
+                          on_failed=lambda error: self.on_fetch_failed(game_id, error))
+
+    def on_fetch_finished(self, game_id, updated):
+        self.in_flight.discard(game_id)
+        # The worker already refreshed fetched_at on disk, reload it lazily.
+        self.feeds.pop(game_id, None)
+        if updated is not None:
+            self.feeds[game_id] = updated
+            self.feed_updated.emit(game_id, updated)
+
+    def on_fetch_failed(self, game_id, error):
+        self.in_flight.discard(game_id)
+        print("Error loading updates feed:", error)
+        self.feed_failed.emit(game_id, error)
+
+    def prefetch(self, feeds):
+        # feeds: (game_id, url) pairs, fetched one per timer tick so they never
+        # compete with what the user is doing.
+        self.prefetch_queue = [(game_id, url) for game_id, url in feeds if not self.is_fresh(game_id, url)]
+        if self.prefetch_queue and not self.suspended:
+            self.prefetch_timer.start()
+
+    def set_suspended(self, suspended):
+        # Only prefetching stops, a feed the user opens is still fetched.
+        self.suspended = suspended
+        if suspended:
+            self.prefetch_timer.stop()
+        elif self.prefetch_queue:
+            self.prefetch_timer.start()
+
+    def prefetch_next(self):
+        if not self.prefetch_queue:
+            self.prefetch_timer.stop()
+            return
+        game_id, url = self.prefetch_queue.pop(0)
+        self.refresh(game_id, url, traffic=PREFETCH)
@@ -0,0 +1,318 @@
+import json
+import os
+import time
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QThreadPool, QTimer, pyqtSignal
+
+from src.install_state import VERSION_FILE
+from src.metrics import metrics
+from src.scheduler import scheduler
+from src.workers import Worker
+
+DISK_USAGE_PATH = "disk_usage.alauncher"
+TRASH_FOLDER = ".trash"
+DELETING_SUFFIX = ".deleting-"
+PROGRESS_INTERVAL = 0.1
+RESCAN_DELAY = 2000
+
+
+def move_to_trash(game_folder, trash_folder):
+    # A rename within games/ is atomic and instant whatever the game's size.
+    os.makedirs(trash_folder, exist_ok=True)
+    trash_path = os.path.join(trash_folder, f"{os.path.basename(game_folder)}-{time.time_ns()}")
+    os.rename(game_folder, trash_path)
+    return trash_path
+
+
+def delete_tree(path, total=0, progress_callback=None, should_stop=None):
+    # Deletes bottom-up, reporting the bytes removed. Returns False when stopped
+    # early, what's left is removed on the next start.
+    with scheduler.disk_job(should_stop):
+        if not os.path.exists(path):
+            return True
+        done = 0
+        last_report = 0
+        for root, dirs, files in os.walk(path, topdown=False):
+            for name in files:
+                if should_stop is not None and should_stop():
+                    return False
+                file_path = os.path.join(root, name)
+                try:
+                    done += os.lstat(file_path).st_size
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                now = time.monotonic()
+                if progress_callback is not None and now - last_report >= PROGRESS_INTERVAL:
+                    progress_callback(done, max(total, done))
+                    last_report = now
+            for name in dirs:
+                dir_path = os.path.join(root, name)
+                # Links to directories are listed as directories but removed as files.
+                if os.path.islink(dir_path):
+                    os.remove(dir_path)
+                else:
+                    os.rmdir(dir_path)
+        os.rmdir(path)
+        if progress_callback is not None:
+            progress_callback(done, max(total, done))
+        return True
+
+
+def scan_usage(path, previous=None, should_stop=None):
+    # Bytes and files under path, with a per-directory index keyed by the path
+    # relative to the game folder: [mtime_ns, bytes, files, subdirectories].
+    # A directory whose mtime is unchanged since the previous scan keeps its
+    # totals and only its subdirectories are visited, so a rescan stats the
+    # directories instead of every file. Files rewritten in place don't change
+    # the mtime; pass no previous index after an install or update.
+    with scheduler.disk_job(should_stop):
+        previous = previous or {}
+        index = {}
+        pending = [""]
+        while pending:
+            if should_stop is not None and should_stop():
+                return None
+            relative = pending.pop()
+            folder = os.path.join(path, relative) if relative else path
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            entry = previous.get(relative)
+            if entry is None or entry[0] != mtime:
+                size = files = 0
+                subdirectories = []
+                try:
+                    with os.scandir(folder) as entries:
+                        for dir_entry in entries:
+                            try:
+                                if dir_entry.is_dir(follow_symlinks=False):
+                                    subdirectories.append(dir_entry.name)
+                                else:
+                                    size += dir_entry.stat(follow_symlinks=False).st_size
+                                    files += 1
+                            except OSError:
+                                pass
+                except FileNotFoundError:
+                    continue
+                entry = [mtime, size, files, subdirectories]
+            index[relative] = entry
+            pending += [os.path.join(relative, name) if relative else name for name in entry[3]]
+        return {"bytes": sum(entry[1] for entry in index.values()),
+                "files": sum(entry[2] for entry in index.values()),
+                "scanned_at": time.time(), "index": index}
+
+
+class FileSystemService(QObject):
+    # Disk work for the game folders off the GUI thread: uninstalls move the
+    # folder to games/.trash and delete it in the background, and the size of
+    # every install is kept in disk_usage.alauncher. Sizes are refreshed by an
+    # incremental scan at start, after installs and when a game folder's
+    # watcher fires.
+    trash_progress = pyqtSignal(object, object, object)
+    trash_emptied = pyqtSignal(object)
+    usage_changed = pyqtSignal(object)
+
+    def __init__(self, games_folder, path=DISK_USAGE_PATH, parent=None):
+        super().__init__(parent)
+        self.games_folder = games_folder
+        self.trash_folder = os.path.join(games_folder, TRASH_FOLDER)
+        self.path = path
+        self.usage = self.load()
+        self.stopping = False
+        self.trashing = {}
+        self.deleting_in_place = set()
+        self.scan_queue = {}
+        self.scanning = None
+        # One worker: deleting and scanning both walk the disk.
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_folder_changed)
+        self.changed_keys = set()
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(RESCAN_DELAY)
+        self.rescan_timer.timeout.connect(self.rescan_changed)
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(RESCAN_DELAY)
+        self.save_timer.timeout.connect(self.save_quietly)
+        self.empty_trash()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as usage_file:
+                return json.load(usage_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print("Error reading disk usage, rescanning:", e)
+            return {}
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as usage_file:
+            json.dump(self.usage, usage_file)
+        os.replace(temp_path, self.path)
+
+    def save_quietly(self):
+        try:
+            self.save()
+        except OSError as e:
+            print("Error saving disk usage:", e)
+
+    def size_of(self, game_id):
+        usage = self.usage.get(str(game_id))
+        return usage["bytes"] if usage is not None else None
+
+    def sizes(self):
+        return {key: usage["bytes"] for key, usage in self.usage.items()}
+
+    def trash_state(self, game_id):
+        # (done, total) bytes while the game's old folder is being deleted.
+        return self.trashing.get(str(game_id))
+
+    def is_deleting_in_place(self, game_id):
+        # The game's folder itself is being deleted, nothing may be installed into it yet.
+        return str(game_id) in self.deleting_in_place
+
+    def sync(self, installed_keys):
+        # Forgets uninstalled games and scans the ones not measured yet.
+        installed_keys = set(installed_keys)
+        for key in list(self.usage):
+            if key not in installed_keys:
+                del self.usage[key]
+                self.save_timer.start()
+        watched = {os.path.basename(path) for path in self.watcher.directories()}
+        for key in watched - installed_keys:
+            self.watcher.removePath(os.path.join(self.games_folder, key))
+        for key in installed_keys - watched:
+            self.watcher.addPath(os.path.join(self.games_folder, key))
+        for key in installed_keys:
+            if key not in self.usage:
+                self.rescan(key, full=True)
+
+    def rescan_all(self):
+        for key in list(self.usage):
+            self.rescan(key)
+
+    def rescan(self, game_id, full=False):
+        key = str(game_id)
+        self.scan_queue[key] = self.scan_queue.get(key, False) or full
+        self.start_next()
+
+    def on_folder_changed(self, path):
+        self.changed_keys.add(os.path.basename(path))
+        self.rescan_timer.start()
+
+    def rescan_changed(self):
+        for key in self.changed_keys:
+            if key in self.usage:
+                self.rescan(key)
+        self.changed_keys.clear()
+
+    def start_next(self):
+        if self.scanning is not None or not self.scan_queue or self.stopping:
+            return
+        key = next(iter(self.scan_queue))
+        full = self.scan_queue.pop(key)
+        self.scanning = key
+        previous = None if full or key not in self.usage else self.usage[key]["index"]
+        worker = Worker(scan_usage, os.path.join(self.games_folder, key), previous,
+                        should_stop=lambda: self.stopping)
+        worker.signals.finished.connect(lambda usage: self.on_scanned(key, usage))
+        worker.signals.failed.connect(lambda error: self.on_scan_failed(key, error))
+        self.pool.start(worker)
+
+    def on_scanned(self, key, usage):
+        self.scanning = None
+        if usage is not None and os.path.isdir(os.path.join(self.games_folder, key)):
+            self.usage[key] = usage
+            self.save_timer.start()
+            self.usage_changed.emit(key)
+        self.start_next()
+
+    def on_scan_failed(self, key, error):
+        self.scanning = None
+        print("Error measuring game folder:", error)
+        self.start_next()
+
+    def trash(self, game_id, game_folder):
+        # Returns once the folder is out of the way; the files are deleted later.
+        key = str(game_id)
+        total = self.size_of(game_id) or 0
+        self.watcher.removePath(game_folder)
+        try:
+            trash_path = move_to_trash(game_folder, self.trash_folder)
+        except OSError as e:
+            # A game folder on another drive can't be renamed into the trash.
+            # Without its version file it no longer counts as installed.
+            print("Can't move the game to the trash:", e)
+            try:
+                os.remove(os.path.join(game_folder, VERSION_FILE))
+            except FileNotFoundError:
+                pass
+            trash_path = f"{game_folder}{DELETING_SUFFIX}{time.time_ns()}"
+            try:
+                os.rename(game_folder, trash_path)
+            except OSError as e:
+                print("Can't rename the game folder either, deleting it in place:", e)
+                trash_path = game_folder
+                self.deleting_in_place.add(key)
+        self.usage.pop(key, None)
+        self.save_timer.start()
+        self.delete(key, trash_path, total)
+
+    def empty_trash(self):
+        # Leftovers of deletions cut short by closing the launcher.
+        try:
+            names = os.listdir(self.trash_folder)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            self.delete(name.rpartition("-")[0] or name, os.path.join(self.trash_folder, name), 0)
+        try:
+            names = os.listdir(self.games_folder)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if DELETING_SUFFIX in name:
+                self.delete(name.partition(DELETING_SUFFIX)[0], os.path.join(self.games_folder, name), 0)
+
+    def delete(self, key, path, total):
+        self.trashing[key] = (0, total)
+        started = time.monotonic()
+        worker = Worker(delete_tree, path, total, should_stop=lambda: self.stopping)
+        worker.kwargs["progress_callback"] = worker.signals.progress.emit
+        worker.signals.progress.connect(lambda done, total: self.on_delete_progress(key, done, total))
+        worker.signals.finished.connect(lambda finished: self.on_deleted(key, started, finished))
+        worker.signals.failed.connect(lambda error: self.on_delete_failed(key, error))
+        self.pool.start(worker)
+        self.trash_progress.emit(key, 0, total)
+
+    def on_delete_progress(self, key, done, total):
+        if key in self.trashing:
+            self.trashing[key] = (done, total)
+            self.trash_progress.emit(key, done, total)
+
+    def on_deleted(self, key, started, finished):
+        self.trashing.pop(key, None)
+        self.deleting_in_place.discard(key)
+        if finished:
+            metrics.observe("uninstall_delete_seconds", time.monotonic() - started)
+        self.trash_emptied.emit(key)
+
+    def on_delete_failed(self, key, error):
+        self.trashing.pop(key, None)
+        self.deleting_in_place.discard(key)
+        print("Error deleting game files:", error)
+        self.trash_emptied.emit(key)
+
+    def shutdown(self):
+        self.stopping = True
+        self.pool.waitForDone()
+        if self.save_timer.isActive():
+            self.save_timer.stop()
+            self.save_quietly()
@@ -0,0 +1,155 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+GAME_ID_ROLE = Qt.UserRole
+UPDATE_BADGE = "  \u2191 Update"
+
+
+class GameListModel(QAbstractListModel):
+    def __init__(self, icon_loader, parent=None):
+        super().__init__(parent)
+        self.icon_loader = icon_loader
+        self.games = []
+        self.rows_by_id = {}
+        self.search_texts = []
+        self.outdated = set()
+
+    def set_games(self, games):
+        self.beginResetModel()
+        self.games = list(games)
+        self.rows_by_id = {game["ID"]: row for row, game in enumerate(self.games)}
+        # Lower-cased once per catalog load so filtering is a plain substring test.
+        self.search_texts = [f"{game['name']}\n{game['developer']}".lower() for game in self.games]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.games)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        game = self.games[index.row()]
+        if role == Qt.DisplayRole:
+            if game["ID"] in self.outdated:
+                return game["name"] + UPDATE_BADGE
+            return game["name"]
+        if role == Qt.DecorationRole:
+            return self.icon_loader.icon_for(game["ID"], game["icon"])
+        if role == GAME_ID_ROLE:
+            return game["ID"]
+        return None
+
+    def game_by_id(self, game_id):
+        row = self.rows_by_id.get(game_id)
+        return self.games[row] if row is not None else None
+
+    def index_for_id(self, game_id):
+        row = self.rows_by_id.get(game_id)
+        return self.index(row) if row is not None else QModelIndex()
+
+    def set_outdated(self, outdated):
+        changed_ids = self.outdated ^ outdated
+        self.outdated = set(outdated)
+        rows = [self.rows_by_id[game_id] for game_id in changed_ids if game_id in self.rows_by_id]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [Qt.DisplayRole])
+
+    def icon_changed(self, game_id):
+        row = self.rows_by_id.get(game_id)
+        if row is None:
+            return
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class GameFilterProxyModel(QAbstractListModel):
+    # A list model over the filtered source rows. Filtering is one pass in plain
+    # Python over the precomputed search texts; index()/parent() stay in C++ so
+    # views do not call back into Python once per row on relayout.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.source_model = None
+        self.search_text = ""
+        self.category_filter = None
+        self.source_rows = []
+        self.proxy_rows = {}
+
+    def setSourceModel(self, source_model):
+        self.source_model = source_model
+        source_model.modelAboutToBeReset.connect(self.beginResetModel)
+        source_model.modelReset.connect(self.on_source_reset)
+        source_model.dataChanged.connect(self.on_source_data_changed)
+        self.beginResetModel()
+        self.on_source_reset()
+
+    def sourceModel(self):
+        return self.source_model
+
+    def set_search_text(self, search_text):
+        search_text = search_text.lower()
+        if search_text != self.search_text:
+            self.search_text = search_text
+            self.refilter()
+
+    def set_category_filter(self, category_filter):
+        self.category_filter = category_filter
+        self.refilter()
+
+    def filtered_source_rows(self):
+        model = self.source_model
+        if self.search_text:
+            rows = [row for row, text in enumerate(model.search_texts) if self.search_text in text]
+        else:
+            rows = range(len(model.games))
+        if self.category_filter is not None:
+            games = model.games
+            rows = [row for row in rows if self.category_filter(games[row]["ID"])]
+        return list(rows)
+
+    def update_mapping(self):
+        self.source_rows = self.filtered_source_rows()
+        self.proxy_rows = {source_row: row for row, source_row in enumerate(self.source_rows)}
+
+    def refilter(self):
+        self.layoutAboutToBeChanged.emit()
+        persistent_indexes = self.persistentIndexList()
+        source_indexes = [self.mapToSource(index) for index in persistent_indexes]
+        self.update_mapping()
+        self.changePersistentIndexList(persistent_indexes, [self.mapFromSource(index) for index in source_indexes])
+        self.layoutChanged.emit()
+
+    def on_source_reset(self):
+        self.update_mapping()
+        self.endResetModel()
+
+    def on_source_data_changed(self, top_left, bottom_right, roles=()):
+        for source_row in range(top_left.row(), bottom_right.row() + 1):
+            row = self.proxy_rows.get(source_row)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, roles)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.source_rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.source_model.data(self.mapToSource(index), role)
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid() or proxy_index.row() >= len(self.source_rows):
+            return QModelIndex()
+        return self.source_model.index(self.source_rows[proxy_index.row()])
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self.proxy_rows.get(source_index.row())
+        return self.index(row) if row is not None else QModelIndex()
+
+    def game_id_at(self, row):
+        return self.source_model.games[self.source_rows[row]]["ID"]
@@ -0,0 +1,319 @@
+import json
+import os
+import urllib.request
+from collections import OrderedDict
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QObject, Qt, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon, QImage, QPixmap
+
+from src.metrics import metrics
+from src.scheduler import INTERACTIVE, scheduler
+from src.workers import Worker
+
+ICONS_FOLDER = "icons"
+LIST_ICON_SIZE = 32
+DETAIL_ICON_SIZE = 150
+PIXMAP_CACHE_BYTES = 32 << 20
+THUMBNAILS_SAVE_DELAY = 2000
+
+
+def icon_path_for(game_id, folder=ICONS_FOLDER):
+    return os.path.join(folder, f"{game_id}.png")
+
+
+def download_icon(url, folder, game_id, timeout=15):
+    icon_path = icon_path_for(game_id, folder)
+    if os.path.exists(icon_path):
+        return icon_path
+    if not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    with metrics.timer("icon_fetch_seconds"), urllib.request.urlopen(url, timeout=timeout) as response:
+        icon_data = response.read()
+    temp_path = icon_path + ".part"
+    with open(temp_path, "wb") as icon_file:
+        icon_file.write(icon_data)
+    os.replace(temp_path, icon_path)
+    return icon_path
+
+
+def make_placeholder_icon(size=64):
+    pixmap = QPixmap(size, size)
+    pixmap.fill(QColor("#444"))
+    return QIcon(pixmap)
+
+
+def load_image(icon_path):
+    image = QImage(icon_path)
+    return None if image.isNull() else image
+
+
+def fit_image(image, size):
+    if image.width() <= size and image.height() <= size:
+        return image
+    return image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def encode_png(image):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(data)
+
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+class PixmapCache:
+    # Decoded pixmaps, least recently used dropped first once the total goes
+    # over max_bytes.
+    def __init__(self, max_bytes=PIXMAP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        pixmap = self.entries.get(key)
+        if pixmap is not None:
+            self.entries.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        self.discard(key)
+        self.entries[key] = pixmap
+        self.total_bytes += pixmap_bytes(pixmap)
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, oldest = self.entries.popitem(last=False)
+            self.total_bytes -= pixmap_bytes(oldest)
+
+    def discard(self, key):
+        pixmap = self.entries.pop(key, None)
+        if pixmap is not None:
+            self.total_bytes -= pixmap_bytes(pixmap)
+
+
+class ThumbnailStore:
+    # List-size icons packed into one file, so a cold start reads that file
+    # instead of opening one PNG per game. New thumbnails are appended to the
+    # pack; the index remembers which icon URL each one was made from.
+    def __init__(self, folder=ICONS_FOLDER, size=LIST_ICON_SIZE):
+        self.pack_path = os.path.join(folder, "thumbnails.pack")
+        self.index_path = os.path.join(folder, "thumbnails.alauncher")
+        self.size = size
+        self.entries = {}
+        self.data = bytearray()
+        self.saved_length = 0
+        self.dead_bytes = 0
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.index_path, "r") as index_file:
+                index = json.load(index_file)
+            with open(self.pack_path, "rb") as pack_file:
+                self.data = bytearray(pack_file.read())
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            print("Error reading icon thumbnails:", e)
+            return
+        if index.get("size") != self.size:
+            self.data = bytearray()
+            return
+        self.saved_length = len(self.data)
+        for key, entry in index.get("thumbnails", {}).items():
+            if entry["offset"] + entry["length"] <= len(self.data):
+                self.entries[key] = entry
+        self.dead_bytes = len(self.data) - sum(entry["length"] for entry in self.entries.values())
+
+    def url_for(self, game_id):
+        entry = self.entries.get(str(game_id))
+        return entry["url"] if entry is not None else None
+
+    def get(self, game_id):
+        entry = self.entries.get(str(game_id))
+        if entry is None:
+            return None
+        return bytes(self.data[entry["offset"]:entry["offset"] + entry["length"]])
+
+    def put(self, game_id, url, png_data):
+        self.remove(game_id)
+        self.entries[str(game_id)] = {"url": url, "offset": len(self.data), "length": len(png_data)}
+        self.data += png_data
+        self.dirty = True
+
+    def remove(self, game_id):
+        entry = self.entries.pop(str(game_id), None)
+        if entry is not None:
+            self.dead_bytes += entry["length"]
+            self.dirty = True
+
+    def pack_size(self):
+        try:
+            return os.path.getsize(self.pack_path)
+        except FileNotFoundError:
+            return 0
+
+    def compact(self):
+        data = bytearray()
+        for entry in self.entries.values():
+            chunk = self.data[entry["offset"]:entry["offset"] + entry["length"]]
+            entry["offset"] = len(data)
+            data += chunk
+        self.data = data
+        self.dead_bytes = 0
+        temp_path = self.pack_path + ".tmp"
+        with open(temp_path, "wb") as pack_file:
+            pack_file.write(self.data)
+        os.replace(temp_path, self.pack_path)
+        self.saved_length = len(self.data)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.pack_path) or ".", exist_ok=True)
+        # The pack is written before the index, so the index never points past its end.
+        if self.dead_bytes > len(self.data) - self.dead_bytes or self.pack_size() != self.saved_length:
+            self.compact()
+        elif len(self.data) > self.saved_length:
+            with open(self.pack_path, "ab") as pack_file:
+                pack_file.write(self.data[self.saved_length:])
+            self.saved_length = len(self.data)
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as index_file:
+            json.dump({"size": self.size, "thumbnails": self.entries}, index_file)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+
+class IconLoader(QObject):
+    icon_ready = pyqtSignal(object, str)
+
+    def __init__(self, folder=ICONS_FOLDER, max_concurrent=4, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.max_concurrent = max_concurrent
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_concurrent)
+        self.pending = {}
+        self.in_flight = set()
+        self.failed = set()
+        self.suspended = False
+        self.placeholder = make_placeholder_icon()
+        self.pixmaps = PixmapCache()
+        self.thumbnails = ThumbnailStore(folder)
+        self.thumbnails.load()
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(THUMBNAILS_SAVE_DELAY)
+        self.save_timer.timeout.connect(self.save)
+
+    def icon_for(self, game_id, url):
+        pixmap = self.list_pixmap(game_id, url)
+        if pixmap is None:
+            self.request(game_id, url)
+            return self.placeholder
+        return QIcon(pixmap)
+
+    def list_pixmap(self, game_id, url):
+        # Keys carry the URL, so a catalog pointing at a new icon never hits an old entry.
+        key = (game_id, url, LIST_ICON_SIZE)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            return pixmap
+        self.forget_if_changed(game_id, url)
+        png_data = self.thumbnails.get(game_id)
+        if png_data is not None:
+            pixmap = QPixmap()
+            pixmap.loadFromData(png_data, "PNG")
+        else:
+            image = load_image(icon_path_for(game_id, self.folder))
+            if image is None:
+                return None
+            thumbnail = fit_image(image, LIST_ICON_SIZE)
+            self.thumbnails.put(game_id, url, encode_png(thumbnail))
+            self.save_timer.start()
+            pixmap = QPixmap.fromImage(thumbnail)
+        self.pixmaps.put(key, pixmap)
+        return pixmap
+
+    def detail_pixmap(self, game_id, url):
+        key = (game_id, url, DETAIL_ICON_SIZE)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            return pixmap
+        self.forget_if_changed(game_id, url)
+        image = load_image(icon_path_for(game_id, self.folder))
+        if image is None:
+            return QPixmap()
+        pixmap = QPixmap.fromImage(image.scaled(DETAIL_ICON_SIZE, DETAIL_ICON_SIZE, Qt.KeepAspectRatio,
+                                                Qt.SmoothTransformation))
+        self.pixmaps.put(key, pixmap)
+        return pixmap
+
+    def forget_if_changed(self, game_id, url):
+        # The catalog points at a different icon now: drop the old file and thumbnail.
+        known_url = self.thumbnails.url_for(game_id)
+        if known_url is None or known_url == url:
+            return
+        self.thumbnails.remove(game_id)
+        self.failed.discard(game_id)
+        try:
+            os.remove(icon_path_for(game_id, self.folder))
+        except FileNotFoundError:
+            pass
+        self.save_timer.start()
+
+    def is_loaded(self, game_id, url):
+        return (game_id, url, LIST_ICON_SIZE) in self.pixmaps
+
+    def save(self):
+        self.save_timer.stop()
+        try:
+            self.thumbnails.save()
+        except OSError as e:
+            print("Error saving icon thumbnails:", e)
+
+    def request(self, game_id, url):
+        if game_id in self.in_flight or game_id in self.failed or game_id in self.pending:
+            return
+        self.pending[game_id] = url
+        self.start_next()
+
+    def prioritize(self, game_ids):
+        # Move the given (usually visible) games to the front of the queue.
+        front = {game_id: self.pending.pop(game_id) for game_id in game_ids if game_id in self.pending}
+        if front:
+            front.update(self.pending)
+            self.pending = front
+
+    def set_suspended(self, suspended):
+        # Requests keep queueing while suspended and are fetched afterwards.
+        self.suspended = suspended
+        self.start_next()
+
+    def start_next(self):
+        while not self.suspended and self.pending and len(self.in_flight) < self.max_concurrent:
+            game_id = next(iter(self.pending))
+            url = self.pending.pop(game_id)
+            self.in_flight.add(game_id)
+            worker = Worker(scheduler.bind(download_icon, INTERACTIVE), url, self.folder, game_id)
+            worker.signals.finished.connect(lambda icon_path, game_id=game_id: self.on_icon_downloaded(game_id, icon_path))
+            worker.signals.failed.connect(lambda error, game_id=game_id: self.on_icon_failed(game_id, error))
+            self.pool.start(worker)
+
+    def on_icon_downloaded(self, game_id, icon_path):
+        self.in_flight.discard(game_id)
+        self.icon_ready.emit(game_id, icon_path)
+        self.start_next()
+
+    def on_icon_failed(self, game_id, error):
+        self.in_flight.discard(game_id)
+        self.failed.add(game_id)
+        metrics.count("icon_fetch_failures_total")
+        print("Error downloading icon:", error)
+        self.start_next()
@@ -0,0 +1,108 @@
+import functools
+import json
+import os
+import time
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+INSTALL_STATE_PATH = "installed_games.alauncher"
+GAMES_FOLDER = "games"
+VERSION_FILE = "installed_version.alauncher"
+
+
+@functools.lru_cache(maxsize=None)
+def version_is_older(installed_version, latest_version):
+    import semver
+    return semver.compare(installed_version, latest_version) < 0
+
+
+def read_version_file(game_folder):
+    try:
+        with open(os.path.join(game_folder, VERSION_FILE), "r") as version_file:
+            return version_file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class InstallState(QObject):
+    # Installed games, keyed by the game folder name (str of the game ID), so
+    # that list filtering and the details panel never have to probe the disk.
+    changed = pyqtSignal()
+
+    def __init__(self, path=INSTALL_STATE_PATH, games_folder=GAMES_FOLDER, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.games_folder = games_folder
+        self.games = self.load()
+
+        if not os.path.exists(games_folder):
+            os.makedirs(games_folder)
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(500)
+        self.rescan_timer.timeout.connect(self.rescan)
+        self.watcher = QFileSystemWatcher([games_folder], self)
+        self.watcher.directoryChanged.connect(lambda path: self.rescan_timer.start())
+        self.rescan()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as state_file:
+                return json.load(state_file).get("games", {})
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print("Install state is corrupt, rebuilding it:", e)
+            return {}
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump({"games": self.games}, state_file)
+        os.replace(temp_path, self.path)
+
+    def rescan(self):
+        # One listdir of games/: picks up installs and removals made outside the launcher.
+        try:
+            folders = set(os.listdir(self.games_folder))
+        except FileNotFoundError:
+            folders = set()
+        changed = False
+        for key in list(self.games):
+            if key not in folders:
+                del self.games[key]
+                changed = True
+        for key in folders - set(self.games):
+            version = read_version_file(os.path.join(self.games_folder, key))
+            if version is not None:
+                self.games[key] = {"version": version, "installed_at": None}
+                changed = True
+        if changed:
+            self.save()
+            self.changed.emit()
+
+    def game_folder(self, game_id):
+        return os.path.join(self.games_folder, str(game_id))
+
+    def is_installed(self, game_id):
+        return str(game_id) in self.games
+
+    def installed_version(self, game_id):
+        entry = self.games.get(str(game_id))
+        return entry["version"] if entry is not None else "0.0.0"
+
+    def install_info(self, game_id):
+        return self.games.get(str(game_id))
+
+    def mark_installed(self, game_id, version):
+        game_folder = self.game_folder(game_id)
+        with open(os.path.join(game_folder, VERSION_FILE), "w") as version_file:
+            version_file.write(version)
+        self.games[str(game_id)] = {"version": version, "installed_at": time.time()}
+        self.save()
+        self.changed.emit()
+
+    def mark_uninstalled(self, game_id):
+        if self.games.pop(str(game_id), None) is not None:
+            self.save()
+            self.changed.emit()
@@ -1,35 +1,73 @@
 import os
-import shutil
-import subprocess
 import sys
 import json
-import urllib.request
-import zipfile
-
-import feedparser
-import semver
-from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QLabel, \
-    QPushButton, QFrame, QProgressDialog, QMessageBox, QLineEdit, QMenu, QApplication, QDialog, QTextBrowser, QComboBox
-from PyQt5.QtGui import QFont, QIcon
-from PyQt5.QtCore import Qt, QSize
-from qt_material import apply_stylesheet
+
+from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFrame, \
+    QMessageBox, QLineEdit, QMenu, QApplication, QDialog, QTextBrowser, QComboBox, QProgressBar, QTableWidget, \
+    QTableWidgetItem, QHeaderView
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QTimer, QEvent, pyqtSignal
 from src.customs.custom_title_bar import CustomTitleBar
+from src.customs.game_list_view import GameListView
+from src.engine import LauncherEngine
+from src.feeds import FeedService
+from src.metrics import metrics
+from src.startup_profiler import StartupProfiler
+from src.theme import apply_theme
+from src.game_list import GAME_ID_ROLE, GameFilterProxyModel, GameListModel
+from src.icons import IconLoader
+from src.install_state import version_is_older
+
+UI_EFFECTS = (Qt.UI_AnimateMenu, Qt.UI_FadeMenu, Qt.UI_AnimateCombo, Qt.UI_AnimateTooltip, Qt.UI_FadeTooltip,
+              Qt.UI_AnimateToolBox)
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_playtime(seconds):
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f"{hours} h {minutes} min" if hours else f"{minutes} min"
 
 
 class GameLauncher(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler=None):
         super().__init__()
+        self.profiler = profiler or StartupProfiler()
+        self.background_work_started = False
 
         self.setWindowTitle("Andus Launcher")
         self.setGeometry(100, 100, 1100, 700)
         self.setWindowFlag(Qt.FramelessWindowHint)
-        apply_stylesheet(self, theme='dark_blue.xml')
+        apply_theme(self)
+        self.profiler.mark("stylesheet")
 
         self.title_bar = CustomTitleBar(self)
         self.setMenuWidget(self.title_bar)
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.favorite_game_ids = self.load_favorite_game_ids()
+        self.engine = LauncherEngine(parent=self)
+        self.engine.catalog_changed.connect(self.on_catalog_changed)
+        self.engine.install_state.changed.connect(self.on_install_state_changed)
+        self.engine.update_checker.updates_changed.connect(self.on_updates_changed)
+        self.engine.install_progress.connect(self.on_download_progress)
+        self.engine.download_manager.download_state_changed.connect(self.on_download_state_changed)
+        self.engine.extraction_manager.extraction_state_changed.connect(self.on_download_state_changed)
+        self.engine.supervisor.game_started.connect(self.on_download_state_changed)
+        self.engine.supervisor.game_exited.connect(self.on_download_state_changed)
+        self.engine.supervisor.running_changed.connect(self.on_game_running_changed)
+        self.engine.filesystem.usage_changed.connect(self.update_disk_label)
+        self.engine.filesystem.trash_progress.connect(self.update_disk_label)
+        self.engine.filesystem.trash_emptied.connect(self.on_trash_emptied)
+        self.ui_effects = {}
+        self.feed_service = FeedService(parent=self)
+        self.icon_loader = IconLoader(parent=self)
+        self.icon_loader.icon_ready.connect(self.on_icon_ready)
 
         self.setup_ui()
 
@@ -38,6 +76,7 @@ class GameLauncher(QMainWindow):
         self.central_widget.setLayout(self.layout)
         self.setup_game_list_and_search()
         self.setup_details_frame()
+        self.profiler.mark("window")
 
         self.load_game_list()
         self.original_working_directory = os.getcwd()
@@ -50,6 +89,10 @@ class GameLauncher(QMainWindow):
         self.search_bar.setFont(QFont("Roboto", 14))
         self.search_bar.setPlaceholderText("Search by Game or Developer")
         self.search_bar.textChanged.connect(self.filter_game_list)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.apply_search_filter)
         self.game_list_and_search_layout.addWidget(self.search_bar)
 
         self.category_combo = QComboBox()
@@ -58,12 +101,31 @@ class GameLauncher(QMainWindow):
         self.category_combo.addItem("Installed")
         self.category_combo.addItem("Not Installed")
         self.category_combo.addItem("Favorites")
+        self.category_combo.addItem("Updates available")
         self.category_combo.currentIndexChanged.connect(self.update_game_list_based_on_category)
         self.game_list_and_search_layout.addWidget(self.category_combo)
 
-        self.game_list_widget = QListWidget()
-        self.game_list_widget.setFont(QFont("Roboto", 14))
-        self.game_list_and_search_layout.addWidget(self.game_list_widget)
+        self.update_all_button = QPushButton("Update all")
+        self.update_all_button.setFont(QFont("Roboto", 12))
+        self.update_all_button.clicked.connect(self.update_all_games)
+        self.update_all_button.setVisible(False)
+        self.game_list_and_search_layout.addWidget(self.update_all_button)
+
+        self.disk_usage_button = QPushButton("Disk usage")
+        self.disk_usage_button.setFont(QFont("Roboto", 12))
+        self.disk_usage_button.clicked.connect(self.open_disk_usage)
+        self.game_list_and_search_layout.addWidget(self.disk_usage_button)
+
+        self.game_list_model = GameListModel(self.icon_loader, self)
+        self.game_list_proxy = GameFilterProxyModel(self)
+        self.game_list_proxy.setSourceModel(self.game_list_model)
+        self.game_list_view = GameListView()
+        self.game_list_view.setFont(QFont("Roboto", 14))
+        self.game_list_view.setModel(self.game_list_proxy)
+        self.game_list_view.clicked.connect(self.update_game_details)
+        self.game_list_view.verticalScrollBar().valueChanged.connect(self.prioritize_visible_icons)
+        self.game_list_view.viewport().installEventFilter(self)
+        self.game_list_and_search_layout.addWidget(self.game_list_view)
 
         self.layout.addLayout(self.game_list_and_search_layout)
 
@@ -81,6 +143,7 @@ class GameLauncher(QMainWindow):
         self.favorite_action = self.options_menu.addAction("Add to Favorites")
         self.open_directory_action = self.options_menu.addAction("Open Game Directory")
         self.open_game_website_action = self.options_menu.addAction("Open Website")
+        self.verify_action = self.options_menu.addAction("Verify Files")
         self.uninstall_action = self.options_menu.addAction("Uninstall")
         
         self.options_button.setMenu(self.options_menu)
@@ -89,6 +152,7 @@ class GameLauncher(QMainWindow):
         self.favorite_action.triggered.connect(self.toggle_favorite)
         self.open_directory_action.triggered.connect(self.open_game_directory)
         self.open_game_website_action.triggered.connect(self.open_game_website)
+        self.verify_action.triggered.connect(self.verify_game_files)
         self.uninstall_action.triggered.connect(self.uninstall_game)
         self.options_button.setVisible(False)
 
@@ -104,6 +168,9 @@ class GameLauncher(QMainWindow):
         self.status_label = QLabel()
         self.status_label.setStyleSheet("font: 12px 'Roboto'; qproperty-alignment: AlignCenter;")
         self.name_and_developer_layout.addWidget(self.status_label, alignment=Qt.AlignCenter)
+        self.disk_label = QLabel()
+        self.disk_label.setStyleSheet("font: 12px 'Roboto'; qproperty-alignment: AlignCenter;")
+        self.name_and_developer_layout.addWidget(self.disk_label, alignment=Qt.AlignCenter)
         self.developer_label = QLabel()
         self.developer_label.setStyleSheet("font: 16px 'Roboto'; qproperty-alignment: AlignCenter;")
         self.name_and_developer_layout.addWidget(self.developer_label, alignment=Qt.AlignCenter)
@@ -122,80 +189,116 @@ class GameLauncher(QMainWindow):
         self.details_layout.addWidget(self.play_button, alignment=Qt.AlignCenter)
         self.play_button.setVisible(False)
 
+        self.download_layout = QHBoxLayout()
+        self.download_progress_bar = QProgressBar()
+        self.download_progress_bar.setRange(0, 100)
+        self.download_layout.addWidget(self.download_progress_bar)
+        self.cancel_download_button = QPushButton("Cancel")
+        self.cancel_download_button.setFont(QFont("Roboto", 12))
+        self.cancel_download_button.clicked.connect(self.cancel_download)
+        self.download_layout.addWidget(self.cancel_download_button)
+        self.details_layout.addLayout(self.download_layout)
+        self.download_progress_bar.setVisible(False)
+        self.cancel_download_button.setVisible(False)
+
         self.layout.addWidget(self.details_frame, 2)
         self.options_button.setVisible(False)
 
     def load_game_list(self):
-        try:
-            url = "https://raw.githubusercontent.com/anduslauncher/gamelist/master/games.json"
-            response = urllib.request.urlopen(url)
-            data = json.load(response)
-            with open("games.json", "w") as json_file:
-                json.dump(data, json_file, indent=4)
-            self.load_game_list_from_data(data)
-        except urllib.error.URLError as e:
-            print("Error loading game list online:", e)
-            try:
-                with open("games.json", "r") as json_file:
-                    data = json.load(json_file)
-                    self.load_game_list_from_data(data)
-            except FileNotFoundError:
-                print("Local game list not found")
+        data = self.engine.catalog_service.load_local()
+        self.profiler.mark("catalog")
+        if data is not None:
+            self.engine.set_catalog(data)
+        else:
+            print("Local game list not found")
+        self.profiler.mark("list population")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.background_work_started:
+            self.background_work_started = True
+            QTimer.singleShot(0, self.start_background_work)
+
+    def start_background_work(self):
+        # Network work waits until the window is up.
+        self.engine.catalog_service.refresh()
+        self.engine.filesystem.rescan_all()
+        self.prioritize_visible_icons()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint and watched is self.game_list_view.viewport():
+            watched.removeEventFilter(self)
+            QTimer.singleShot(0, self.on_first_paint)
+        return super().eventFilter(watched, event)
+
+    def on_first_paint(self):
+        self.profiler.mark("first paint")
+        self.profiler.report()
 
     def load_game_list_from_data(self, data):
-        self.game_list_widget.clear()
-        self.games = data["games"]
-        self.update_game_list_based_on_category()
-        self.game_list_widget.itemClicked.connect(self.update_game_details)
+        with metrics.timer("list_population_seconds"):
+            self.game_list_model.set_games(data["games"])
+        self.select_first_game_if_none()
+        self.prioritize_visible_icons()
+        self.prefetch_favorite_feeds()
+
+    def on_catalog_changed(self, data):
+        selected_game_id = self.selected_game_info["ID"] if hasattr(self, 'selected_game_info') else None
+        self.load_game_list_from_data(data)
+        if selected_game_id is None:
+            return
+        index = self.game_list_proxy.mapFromSource(self.game_list_model.index_for_id(selected_game_id))
+        if index.isValid():
+            self.game_list_view.setCurrentIndex(index)
+            self.update_game_details(index)
 
     def update_game_list_based_on_category(self):
         current_category = self.category_combo.currentIndex()
-        self.game_list_widget.clear()
-
-        for game in self.games:
-            if current_category == 0:  # All games
-                self.add_game_item(game)
-            elif current_category == 1:  # Installed games
-                if self.is_game_installed(game["ID"]):
-                    self.add_game_item(game)
-            elif current_category == 2:  # Not Installed games
-                if not self.is_game_installed(game["ID"]):
-                    self.add_game_item(game)
-            elif current_category == 3:  # Favorite games
-                if game["ID"] in self.favorite_game_ids:
-                    self.add_game_item(game)
-
-    def update_game_list_categories(self):
-        selected_category_index = self.category_combo.currentIndex()
-
-        if selected_category_index == 0:  # All games
-            self.load_game_list()
-        elif selected_category_index == 1:  # Installed games
-            self.update_game_list_based_on_category(self.is_game_installed)
-        elif selected_category_index == 2:  # Not Installed games
-            self.update_game_list_based_on_category(lambda game_id: not self.is_game_installed(game_id))
-        elif selected_category_index == 3:  # Favorite games
-            self.update_game_list_based_on_category(lambda game_id: game_id in self.favorite_game_ids)
 
-    def filter_game_list(self, filter_text):
-        filter_text = filter_text.lower()
-        self.game_list_widget.clear()
+        if current_category == 0:  # All games
+            category_filter = None
+        elif current_category == 1:  # Installed games
+            category_filter = self.is_game_installed
+        elif current_category == 2:  # Not Installed games
+            category_filter = lambda game_id: not self.is_game_installed(game_id)
+        elif current_category == 3:  # Favorite games
+            category_filter = lambda game_id: game_id in self.favorite_game_ids
+        else:  # Games with updates available
+            category_filter = self.engine.update_checker.is_outdated
+        self.game_list_proxy.set_category_filter(category_filter)
+        self.select_first_game_if_none()
+        self.prioritize_visible_icons()
 
-        for game in self.games:
-            if filter_text in game["name"].lower() or filter_text in game["developer"].lower():
-                self.add_game_item(game)
+    def filter_game_list(self, filter_text):
+        # Debounced: the proxy is only re-filtered once typing pauses.
+        self.search_timer.start()
+
+    def apply_search_filter(self):
+        self.game_list_proxy.set_search_text(self.search_bar.text())
+        self.select_first_game_if_none()
+        self.prioritize_visible_icons()
+
+    def select_first_game_if_none(self):
+        if not self.game_list_view.currentIndex().isValid() and self.game_list_proxy.rowCount() > 0:
+            self.game_list_view.setCurrentIndex(self.game_list_proxy.index(0))
+
+    def visible_game_ids(self):
+        viewport = self.game_list_view.viewport()
+        first_index = self.game_list_view.indexAt(viewport.rect().topLeft())
+        if not first_index.isValid():
+            return []
+        last_index = self.game_list_view.indexAt(viewport.rect().bottomLeft())
+        last_row = last_index.row() if last_index.isValid() else self.game_list_proxy.rowCount() - 1
+        return [self.game_list_proxy.game_id_at(row) for row in range(first_index.row(), last_row + 1)]
 
-    def add_game_item(self, game):
-        game_item = QListWidgetItem(game["name"])
-        self.game_list_widget.addItem(game_item)
-        icon_url = game["icon"]
-        icon_path = os.path.join("icons", f"{game['ID']}.png")
-        if not os.path.exists(icon_path):
-            self.download_icon(icon_url, "icons", str(game['ID']))
-        icon = QIcon(icon_path)
-        game_item.setIcon(icon)
+    def prioritize_visible_icons(self):
+        if self.isVisible():
+            self.icon_loader.prioritize(self.visible_game_ids())
 
-        self.game_list_widget.setCurrentRow(0)
+    def on_icon_ready(self, game_id, icon_path):
+        self.game_list_model.icon_changed(game_id)
+        if hasattr(self, 'selected_game_info') and self.selected_game_info["ID"] == game_id:
+            self.update_game_details(self.game_list_view.currentIndex())
 
     def toggle_favorite(self):
         if hasattr(self, 'selected_game_info'):
@@ -205,7 +308,15 @@ class GameLauncher(QMainWindow):
             else:
                 self.favorite_game_ids.append(game_id)
             self.save_favorite_game_ids(self.favorite_game_ids)
-            self.update_game_details(self.game_list_widget.currentItem())
+            self.update_game_details(self.game_list_view.currentIndex())
+
+    def prefetch_favorite_feeds(self):
+        feeds = []
+        for game_id in self.favorite_game_ids:
+            game_info = self.game_list_model.game_by_id(game_id)
+            if game_info is not None and "rss_feed" in game_info:
+                feeds.append((game_id, game_info["rss_feed"]))
+        self.feed_service.prefetch(feeds)
 
     def load_favorite_game_ids(self):
         try:
@@ -221,26 +332,40 @@ class GameLauncher(QMainWindow):
             json.dump(favorites_data, favorites_file)
 
 
-    def update_game_details(self, item):
-        selected_game = item.text()
-        game_info = next((game for game in self.games if game["name"] == selected_game), None)
+    def update_game_details(self, index):
+        game_info = self.game_list_model.game_by_id(index.data(GAME_ID_ROLE)) if index.isValid() else None
         if game_info:
             self.name_label.setText(game_info["name"])
             self.developer_label.setText(game_info["developer"])
-            self.status_label.setText("Status: " + game_info["devstatus"])
+            playtime = self.engine.supervisor.total_playtime(game_info["ID"])
+            if playtime >= 60:
+                self.status_label.setText(f"Status: {game_info['devstatus']} · Played {format_playtime(playtime)}")
+            else:
+                self.status_label.setText("Status: " + game_info["devstatus"])
             self.description_label.setText("Description: " + game_info["description"])
-            icon_path = os.path.join("icons", f"{game_info['ID']}.png")
-            icon = QIcon(icon_path)
-            original_pixmap = icon.pixmap(128, 128)
-            scaled_pixmap = original_pixmap.scaled(QSize(150, 150), Qt.KeepAspectRatio)
-            self.icon_label.setPixmap(scaled_pixmap)
+            self.icon_label.setPixmap(self.icon_loader.detail_pixmap(game_info["ID"], game_info["icon"]))
             self.selected_game_info = game_info
             installed_version = self.get_installed_version(game_info["ID"])
             latest_version = game_info.get("version", "0.0.0")
 
-            version_comparison = semver.compare(installed_version, latest_version)
-            if os.path.exists(os.path.join("games", str(game_info["ID"]))):
-                if version_comparison < 0:
+            download_job = self.engine.download_manager.job_for(game_info["ID"])
+            self.play_button.setEnabled(True)
+            if self.engine.supervisor.is_running(game_info["ID"]):
+                self.play_button.setText("Running")
+                self.play_button.setEnabled(False)
+                self.play_button.setStyleSheet("background-color: #006B3C; color: white;")
+            elif self.engine.extraction_manager.job_for(game_info["ID"]) is not None:
+                self.play_button.setText("Extracting")
+                self.play_button.setEnabled(False)
+                self.play_button.setStyleSheet("background-color: #008F9F; color: white;")
+            elif download_job is not None:
+                if download_job.state == "paused":
+                    self.play_button.setText("Resume")
+                else:
+                    self.play_button.setText("Pause")
+                self.play_button.setStyleSheet("background-color: #008F9F; color: white;")
+            elif self.is_game_installed(game_info["ID"]):
+                if version_is_older(installed_version, latest_version):
                     self.play_button.setText("Update")
                     self.play_button.setStyleSheet("background-color: #CC9900; color: white; border: 2px solid "
                                                    "#A97D00;")
@@ -250,10 +375,18 @@ class GameLauncher(QMainWindow):
             else:
                 self.play_button.setText("Download")
                 self.play_button.setStyleSheet("background-color: #008F9F; color: white;")
+                # Enabled again by trash_emptied once the old folder is gone.
+                self.play_button.setEnabled(not self.engine.filesystem.is_deleting_in_place(game_info["ID"]))
             if "website" in game_info:
                 self.open_game_website_action.setVisible(True)
             else:
                 self.open_game_website_action.setVisible(False)
+            running = self.engine.supervisor.is_running(game_info["ID"])
+            # Outdated installs get the Update button instead, repairs need the current version.
+            self.verify_action.setVisible(self.is_game_installed(game_info["ID"])
+                                          and installed_version == latest_version
+                                          and not self.engine.is_busy(game_info["ID"]) and not running)
+            self.uninstall_action.setVisible(not running)
             if 'rss_feed' in game_info:
                 self.updates_action.setVisible(True)
             else:
@@ -264,125 +397,107 @@ class GameLauncher(QMainWindow):
                 self.favorite_action.setText("Add to Favorites")
             self.play_button.setVisible(True)
             self.options_button.setVisible(True)
+            self.update_download_progress(game_info["ID"])
+            self.update_disk_label(game_info["ID"])
+
+    def update_download_progress(self, game_id):
+        extraction_job = self.engine.extraction_manager.job_for(game_id)
+        download_job = self.engine.download_manager.job_for(game_id)
+        if extraction_job is not None:
+            done, total = extraction_job.done, extraction_job.total
+        elif download_job is not None:
+            done, total = download_job.downloaded, download_job.total
+        else:
+            done = total = None
+        self.download_progress_bar.setVisible(total is not None)
+        self.cancel_download_button.setVisible(total is not None)
+        if total is not None:
+            self.download_progress_bar.setValue(int(done * 100 / total) if total else 0)
+
+    def update_disk_label(self, game_id, *args):
+        if not hasattr(self, 'selected_game_info') or str(self.selected_game_info["ID"]) != str(game_id):
+            return
+        trash_state = self.engine.filesystem.trash_state(game_id)
+        size = self.engine.filesystem.size_of(game_id)
+        if trash_state is not None:
+            done, total = trash_state
+            percent = f" {int(done * 100 / total)}%" if total else ""
+            self.disk_label.setText(f"Removing old files...{percent}")
+        elif size is not None and self.is_game_installed(self.selected_game_info["ID"]):
+            self.disk_label.setText(f"Size on disk: {format_size(size)}")
+        else:
+            self.disk_label.setText("")
+        self.disk_label.setVisible(bool(self.disk_label.text()))
+
+    def on_trash_emptied(self, game_id):
+        if hasattr(self, 'selected_game_info') and str(self.selected_game_info["ID"]) == str(game_id):
+            self.update_game_details(self.game_list_view.currentIndex())
+
+    def open_disk_usage(self):
+        disk_usage_window = DiskUsageWindow(self.engine.filesystem.sizes(), self.game_list_model, self)
+        disk_usage_window.game_chosen.connect(self.select_game)
+        disk_usage_window.exec_()
+        disk_usage_window.deleteLater()
+
+    def select_game(self, game_id):
+        index = self.game_list_proxy.mapFromSource(self.game_list_model.index_for_id(game_id))
+        if not index.isValid():
+            self.category_combo.setCurrentIndex(0)
+            self.search_bar.clear()
+            self.apply_search_filter()
+            index = self.game_list_proxy.mapFromSource(self.game_list_model.index_for_id(game_id))
+        if index.isValid():
+            self.game_list_view.setCurrentIndex(index)
+            self.game_list_view.scrollTo(index)
+            self.update_game_details(index)
 
     def get_installed_version(self, game_id):
-        game_folder = os.path.join("games", str(game_id))
-        version_file_path = os.path.join(game_folder, "installed_version.alauncher")
-        if os.path.exists(version_file_path):
-            with open(version_file_path, "r") as version_file:
-                return version_file.read().strip()
-        return "0.0.0"
-
-    def download_game(self):
-        if hasattr(self, 'selected_game_info'):
-            game_info = self.selected_game_info
-            platform = "win" if sys.platform == "win32" else "linux"
-            download_link_key = f"download_link_{platform}"
-            if download_link_key in game_info:
-                download_url = game_info[download_link_key]
-                download_folder = "games"
-
-                if not os.path.exists(download_folder):
-                    os.makedirs(download_folder)
-                game_id = game_info["ID"]
-                game_folder = os.path.join(download_folder, str(game_id))
-                game_file_name = os.path.basename(download_url)
-                game_file_path = os.path.join(game_folder, game_file_name)
-
-                if not os.path.exists(game_file_path):
-                    self.show_progress_dialog("Downloading", "Downloading the game...", self.download_game_file,
-                                              download_url, game_file_path)
-                else:
-                    self.show_progress_dialog("Extracting", "Extracting the game...", self.extract_game, game_file_path,
-                                              game_folder)
-
-    def download_game_file(self, url, local_path):
-        def report_hook(count, block_size, total_size):
-            if self.progress_dialog is not None:
-                percentage = int(count * block_size * 100 / total_size)
-                self.progress_dialog.setValue(percentage)
+        return self.engine.installed_version(game_id)
 
-        print("Downloading from:", url)
-        print("Saving to:", local_path)
-
-        if not os.path.exists(os.path.dirname(local_path)):
-            os.makedirs(os.path.dirname(local_path))
-
-        urllib.request.urlretrieve(url, local_path, report_hook)
-        self.progress_dialog.close()
-        self.save_installed_version(os.path.dirname(local_path), self.selected_game_info["version"])
-        self.update_local_games_json()
+    def download_game(self, game_info=None):
+        if game_info is None and hasattr(self, 'selected_game_info'):
+            game_info = self.selected_game_info
+        if game_info is not None:
+            self.engine.install(game_info)
 
-        if local_path.endswith(".zip"):
-            game_folder = os.path.dirname(local_path)
-            self.show_progress_dialog("Extracting", "Extracting the game...", self.extract_game, local_path, game_folder)
+    def toggle_download_paused(self):
+        game_id = self.selected_game_info["ID"]
+        if self.engine.download_manager.job_for(game_id).state == "paused":
+            self.engine.download_manager.resume(game_id)
         else:
-            self.play_button.setText("Play")
-            self.update_game_details(self.game_list_widget.currentItem())
-
-    def extract_game(self, zip_file_path, extraction_path):
-        print("Extracting the game")
-        with zipfile.ZipFile(zip_file_path, "r") as zip_ref:
-            total_files = len(zip_ref.infolist())
-            extracted_files = 0
-            for item in zip_ref.infolist():
-                extracted_files += 1
-                percentage = int(extracted_files * 100 / total_files)
-                self.progress_dialog.setValue(percentage)
-                zip_ref.extract(item, extraction_path)
-            os.remove(zip_file_path)
-            self.progress_dialog.close()
-            self.play_button.setText("Play")
-            self.update_game_details(self.game_list_widget.currentItem())
-
-    def show_progress_dialog(self, title, label, callback, *args):
-        self.progress_dialog = QProgressDialog(label, "Cancel", 0, 100, self)
-        self.progress_dialog.setWindowTitle(title)
-        self.progress_dialog.setWindowModality(Qt.WindowModal)
-        self.progress_dialog.setAutoClose(True)
-        self.progress_dialog.setAutoReset(True)
-        self.progress_dialog.setValue(0)
-        self.progress_dialog.show()
-        self.progress_dialog.canceled.connect(self.progress_dialog.close)
-        callback(*args)
-
-    def save_installed_version(self, game_folder, version):
-        version_file_path = os.path.join(game_folder, "installed_version.alauncher")
-        with open(version_file_path, "w") as version_file:
-            version_file.write(version)
-
-    def update_local_games_json(self):
-        try:
-            url = "https://raw.githubusercontent.com/anduslauncher/gamelist/master/games.json"
-            response = urllib.request.urlopen(url)
-            new_data = json.load(response)
-            with open("games.json", "r+") as json_file:
-                current_data = json.load(json_file)
-                json_file.seek(0)
-                json.dump(new_data, json_file, indent=4)
-                json_file.truncate()
-                self.games = new_data["games"]
-        except urllib.error.URLError as e:
-            print("Error updating local game list:", e)
-
-    def download_icon(self, url, folder, game_id):
-        icon_path = os.path.join(folder, f"{game_id}.png")
-        if os.path.exists(icon_path):
-            print(f"Icon {game_id}.png already exists, not downloading")
-            return
-        try:
-            if not os.path.exists(folder):
-                os.makedirs(folder)
-            response = urllib.request.urlopen(url)
-            icon_data = response.read()
-            with open(icon_path, "wb") as icon_file:
-                icon_file.write(icon_data)
-        except Exception as e:
-            print("Error downloading icon:", e)
+            self.engine.download_manager.pause(game_id)
+
+    def cancel_download(self):
+        if hasattr(self, 'selected_game_info'):
+            self.engine.cancel(self.selected_game_info["ID"])
+
+    def on_download_progress(self, game_id, done, total, phase=None):
+        if hasattr(self, 'selected_game_info') and self.selected_game_info["ID"] == game_id:
+            self.update_download_progress(game_id)
+
+    def on_download_state_changed(self, game_id):
+        if hasattr(self, 'selected_game_info') and self.selected_game_info["ID"] == game_id:
+            self.update_game_details(self.game_list_view.currentIndex())
+
+    def on_game_running_changed(self, running):
+        # Low-footprint mode: no icon or feed fetching and no UI animations
+        # while a game runs.
+        if self.engine.settings["pause_while_playing"]:
+            self.icon_loader.set_suspended(running)
+            self.feed_service.set_suspended(running)
+        if running:
+            self.ui_effects = {effect: QApplication.isEffectEnabled(effect) for effect in UI_EFFECTS}
+        for effect, enabled in self.ui_effects.items():
+            QApplication.setEffectEnabled(effect, enabled and not running)
 
     def play_game(self):
         if hasattr(self, 'selected_game_info'):
             game_info = self.selected_game_info
+            if self.engine.supervisor.is_running(game_info["ID"]):
+                return
+            if self.engine.download_manager.job_for(game_info["ID"]) is not None:
+                self.toggle_download_paused()
+                return
             platform = "win" if sys.platform == "win32" else "linux"
             executable_key = f"exec_{platform}"
 
@@ -399,7 +514,7 @@ class GameLauncher(QMainWindow):
                     if os.path.exists(executable_path):
                         if platform == "linux":
                             os.chmod(executable_path, 0o755)
-                        subprocess.Popen([executable_path], shell=True)
+                        self.engine.supervisor.launch(game_id, executable_path)
                     else:
                         print(f"Executable '{executable}' not found in '{game_folder}'.")
                         print("Attempting to download the game.")
@@ -408,8 +523,26 @@ class GameLauncher(QMainWindow):
                 self.download_game()
 
     def is_game_installed(self, game_id):
-        game_folder = os.path.join("games", str(game_id))
-        return os.path.exists(game_folder)
+        return self.engine.is_installed(game_id)
+
+    def on_install_state_changed(self):
+        if self.category_combo.currentIndex() in (1, 2):  # Installed / Not Installed
+            self.update_game_list_based_on_category()
+        if hasattr(self, 'selected_game_info'):
+            self.update_game_details(self.game_list_view.currentIndex())
+
+    def on_updates_changed(self, outdated):
+        self.game_list_model.set_outdated(outdated)
+        self.update_all_button.setText(f"Update all ({len(outdated)})")
+        self.update_all_button.setVisible(bool(outdated))
+        if self.category_combo.currentIndex() == 4:  # Updates available
+            self.update_game_list_based_on_category()
+
+    def update_all_games(self):
+        for game_id in sorted(self.engine.update_checker.outdated):
+            game_info = self.engine.game_by_id(game_id)
+            if game_info is not None and not self.engine.is_busy(game_id):
+                self.engine.install(game_info)
 
     def uninstall_game(self):
         if hasattr(self, 'selected_game_info'):
@@ -428,12 +561,15 @@ class GameLauncher(QMainWindow):
         )
         if response == QMessageBox.Yes:
             try:
-                shutil.rmtree(game_folder)
-                print(f"Game uninstalled: {game_folder}")
-                self.update_game_details(self.game_list_widget.currentItem())
+                self.engine.uninstall(self.selected_game_info["ID"])
+                self.update_game_details(self.game_list_view.currentIndex())
             except Exception as e:
                 print("Error uninstalling game:", e)
 
+    def verify_game_files(self):
+        if hasattr(self, 'selected_game_info') and not self.engine.is_busy(self.selected_game_info["ID"]):
+            self.engine.repair(self.selected_game_info)
+
     def open_game_directory(self):
         if hasattr(self, 'selected_game_info'):
             game_info = self.selected_game_info
@@ -461,13 +597,19 @@ class GameLauncher(QMainWindow):
             if 'rss_feed' in game_info:
                 rss_feed_url = game_info['rss_feed']
                 game_name = game_info['name']
-                rss_reader_window = RSSReaderWindow(game_name)
+                rss_reader_window = RSSReaderWindow(game_name, self.feed_service, game_info["ID"], self)
                 rss_reader_window.load_feed(rss_feed_url, game_name)
                 rss_reader_window.exec_()
+                rss_reader_window.deleteLater()
 
     def close_button_clicked(self):
         self.close()
 
+    def closeEvent(self, event):
+        self.icon_loader.save()
+        self.engine.shutdown()
+        super().closeEvent(event)
+
     def center_on_screen(self):
         screen_geometry = QApplication.desktop().screenGeometry()
 
@@ -477,19 +619,66 @@ class GameLauncher(QMainWindow):
         self.move(x, y)
 
     def unzip_game(self, zip_file, destination):
-        with zipfile.ZipFile(zip_file, "r") as zip_ref:
-            zip_ref.extractall(destination)
+        from src.extraction import extract_archive
+        extract_archive(zip_file, destination, processes=self.engine.settings["extraction_processes"])
         print(f"{os.path.basename(zip_file)} unzipped to {destination}")
 
-    def save_installed_version(self, game_folder, version):
-        version_file_path = os.path.join(game_folder, "installed_version.alauncher")
-        with open(version_file_path, "w") as version_file:
-            version_file.write(version)
+
+class SizeItem(QTableWidgetItem):
+    # Sorts by bytes instead of the formatted text.
+    def __init__(self, size):
+        super().__init__(format_size(size))
+        self.size = size
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        return self.size < other.size if isinstance(other, SizeItem) else super().__lt__(other)
+
+
+class DiskUsageWindow(QDialog):
+    game_chosen = pyqtSignal(object)
+
+    def __init__(self, sizes, game_list_model, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Disk usage")
+        self.setGeometry(200, 200, 600, 500)
+        self.layout = QVBoxLayout(self)
+
+        self.total_label = QLabel(f"{len(sizes)} games installed, {format_size(sum(sizes.values()))} in total")
+        self.total_label.setFont(QFont("Roboto", 12))
+        self.layout.addWidget(self.total_label)
+
+        self.table = QTableWidget(len(sizes), 2)
+        self.table.setHorizontalHeaderLabels(["Game", "Size"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        for row, (key, size) in enumerate(sizes.items()):
+            game_id = int(key) if key.isdigit() else key
+            game_info = game_list_model.game_by_id(game_id)
+            name_item = QTableWidgetItem(game_info["name"] if game_info is not None else f"Game {key}")
+            name_item.setData(Qt.UserRole, game_id)
+            self.table.setItem(row, 0, name_item)
+            self.table.setItem(row, 1, SizeItem(size))
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(1, Qt.DescendingOrder)
+        self.table.cellDoubleClicked.connect(self.choose_game)
+        self.layout.addWidget(self.table)
+
+    def choose_game(self, row, column):
+        self.game_chosen.emit(self.table.item(row, 0).data(Qt.UserRole))
+        self.accept()
 
 
 class RSSReaderWindow(QDialog):
-    def __init__(self, game_name, parent=None):
+    def __init__(self, game_name, feed_service, game_id, parent=None):
         super().__init__(parent)
+        self.feed_service = feed_service
+        self.game_id = game_id
+        self.game_name = game_name
+        self.feed_service.feed_updated.connect(self.on_feed_updated)
+        self.feed_service.feed_failed.connect(self.on_feed_failed)
         self.setWindowTitle(f"{game_name} - Updates")
         self.setGeometry(200, 200, 800, 600)
 
@@ -503,16 +692,36 @@ class RSSReaderWindow(QDialog):
         self.layout.addWidget(self.text_browser)
 
     def load_feed(self, feed_url, game_name):
-        feed = feedparser.parse(feed_url)
+        # Shows the cached entries right away and refreshes in the background.
+        cached = self.feed_service.cached(self.game_id)
+        if cached is not None and cached.get("url") == feed_url:
+            self.show_entries(cached["entries"])
+        else:
+            self.text_browser.setHtml(f"<h1>{game_name} Updates</h1><p>Loading...</p>")
+        self.feed_service.refresh(self.game_id, feed_url)
+
+    def on_feed_updated(self, game_id, cached):
+        if game_id == self.game_id:
+            self.show_entries(cached["entries"])
+
+    def on_feed_failed(self, game_id, error):
+        if game_id == self.game_id and self.feed_service.cached(game_id) is None:
+            self.text_browser.setHtml(f"<h1>{self.game_name} Updates</h1><p>Can't load updates: {error}</p>")
+
+    def done(self, result):
+        self.feed_service.feed_updated.disconnect(self.on_feed_updated)
+        self.feed_service.feed_failed.disconnect(self.on_feed_failed)
+        super().done(result)
 
+    def show_entries(self, entries):
         html_content = "<style>a { color: #007bff; text-decoration: none; }</style>"
-        html_content += f"<h1>{game_name} Updates</h1>"
+        html_content += f"<h1>{self.game_name} Updates</h1>"
 
-        for entry in feed.entries:
-            title = entry.title
-            published_date = entry.published
-            link = entry.link
-            summary = entry.summary
+        for entry in entries:
+            title = entry["title"]
+            published_date = entry["published"]
+            link = entry["link"]
+            summary = entry["summary"]
 
             html_content += f"<h2><a href='{link}'>{title}</a></h2>"
             html_content += f"<p><em>{published_date}</em></p>"
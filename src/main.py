@@ -1,13 +1,21 @@
+import time
+
+STARTED = time.perf_counter()
+
+import multiprocessing
 import sys
 
-from PyQt5.QtNetwork import QNetworkAccessManager
 from PyQt5.QtWidgets import QApplication
 from launcher import GameLauncher
+from startup_profiler import StartupProfiler
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    profiler = StartupProfiler("--profile-startup" in sys.argv, STARTED)
+    profiler.mark("imports")
     app = QApplication(sys.argv)
-    launcher = GameLauncher()
-    launcher.network_manager = QNetworkAccessManager()
-    launcher.update_local_games_json()
+    profiler.mark("qt init")
+    launcher = GameLauncher(profiler)
     launcher.show()
+    profiler.mark("show")
     sys.exit(app.exec_())
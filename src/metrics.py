@@ -0,0 +1,125 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+METRICS_LOG_PATH = "metrics.jsonl"
+METRICS_LOG_SIZE = 1 << 20
+METRICS_LOG_BACKUPS = 3
+PROMETHEUS_INTERVAL = 5.0
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def prometheus_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+class Metrics:
+    # Counters and timings from the hot paths. Every sample is appended to a
+    # JSON-lines log that rotates at 1 MiB; totals can also be exported in the
+    # Prometheus text format (e.g. for node_exporter's textfile collector).
+    # Safe to call from worker threads.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.log_path = None
+        self.log_file = None
+        self.prometheus_path = None
+        self.last_export = 0
+        self.counters = {}
+        self.summaries = {}
+
+    def configure(self, enabled=True, log_path=METRICS_LOG_PATH, prometheus_path=None):
+        with self.lock:
+            self.enabled = enabled
+            self.prometheus_path = prometheus_path or None
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+            self.log_path = log_path if enabled else None
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            key = (name, label_key(labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.record(name, value, labels)
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            key = (name, label_key(labels))
+            count, total = self.summaries.get(key, (0, 0.0))
+            self.summaries[key] = (count + 1, total + value)
+        self.record(name, value, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record(self, name, value, labels):
+        line = json.dumps({"time": round(time.time(), 3), "metric": name, "value": value, **labels}) + "\n"
+        with self.lock:
+            try:
+                self.write_line(line)
+            except OSError as e:
+                print("Error writing metrics:", e)
+                self.log_path = None
+        if self.prometheus_path is not None and time.monotonic() - self.last_export >= PROMETHEUS_INTERVAL:
+            self.export_prometheus()
+
+    def write_line(self, line):
+        if self.log_path is None:
+            return
+        if self.log_file is None:
+            self.log_file = open(self.log_path, "a")
+        if self.log_file.tell() + len(line) > METRICS_LOG_SIZE:
+            self.log_file.close()
+            for index in range(METRICS_LOG_BACKUPS - 1, 0, -1):
+                if os.path.exists(f"{self.log_path}.{index}"):
+                    os.replace(f"{self.log_path}.{index}", f"{self.log_path}.{index + 1}")
+            os.replace(self.log_path, f"{self.log_path}.1")
+            self.log_file = open(self.log_path, "a")
+        self.log_file.write(line)
+        self.log_file.flush()
+
+    def close(self):
+        self.export_prometheus()
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+
+    def export_prometheus(self):
+        if self.prometheus_path is None:
+            return
+        with self.lock:
+            self.last_export = time.monotonic()
+            lines = []
+            for (name, key), value in sorted(self.counters.items()):
+                lines.append(f"alauncher_{name}{prometheus_labels(key)} {value}")
+            for (name, key), (count, total) in sorted(self.summaries.items()):
+                lines.append(f"alauncher_{name}_count{prometheus_labels(key)} {count}")
+                lines.append(f"alauncher_{name}_sum{prometheus_labels(key)} {total}")
+            temp_path = self.prometheus_path + ".tmp"
+            try:
+                with open(temp_path, "w") as prometheus_file:
+                    prometheus_file.write("\n".join(lines) + "\n")
+                os.replace(temp_path, self.prometheus_path)
+            except OSError as e:
+                print("Error writing metrics:", e)
+
+
+metrics = Metrics()
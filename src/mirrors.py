@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from src.scheduler import scheduler
+
+MIRRORS_PATH = "mirrors.alauncher"
+PROBE_TTL = 3600
+PROBE_TIMEOUT = 5
+FAILURE_COOLDOWN = 600
+SCORE_SIZE = 8 << 20
+SMOOTHING = 0.3
+
+
+def host_of(url):
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def expand_mirrors(urls, rewrites):
+    # rewrites maps a URL prefix to the prefixes of mirrors holding the same
+    # files, e.g. a site-local copy of the game hosts.
+    expanded = []
+    for url in urls:
+        candidates = [url]
+        for prefix, replacements in rewrites.items():
+            if url.startswith(prefix):
+                candidates += [replacement + url[len(prefix):] for replacement in replacements]
+        for candidate in candidates:
+            if candidate not in expanded:
+                expanded.append(candidate)
+    return expanded
+
+
+def probe_latency(url, timeout=PROBE_TIMEOUT):
+    request = urllib.request.Request(url)
+    request.add_header("Range", "bytes=0-0")
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout):
+        return time.perf_counter() - started
+
+
+def smoothed(previous, value):
+    return value if previous is None else previous + SMOOTHING * (value - previous)
+
+
+class MirrorStats:
+    # Latency, throughput and the last failure of every host, kept between
+    # sessions so the fastest mirror is tried first without probing again.
+    def __init__(self, path=MIRRORS_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.hosts = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as mirrors_file:
+                return json.load(mirrors_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print("Error reading mirror statistics:", e)
+            return {}
+
+    def save(self):
+        with self.lock:
+            temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as mirrors_file:
+                json.dump(self.hosts, mirrors_file)
+            os.replace(temp_path, self.path)
+
+    def host(self, url):
+        return self.hosts.setdefault(host_of(url), {"latency": None, "throughput": None, "failed_at": 0,
+                                                    "probed_at": 0})
+
+    def record_latency(self, url, seconds):
+        with self.lock:
+            host = self.host(url)
+            host["latency"] = smoothed(host["latency"], seconds)
+            host["probed_at"] = time.time()
+            host["failed_at"] = 0
+
+    def record_throughput(self, url, transferred, seconds):
+        if transferred <= 0 or seconds <= 0:
+            return
+        with self.lock:
+            host = self.host(url)
+            host["throughput"] = smoothed(host["throughput"], transferred / seconds)
+            host["failed_at"] = 0
+
+    def record_failure(self, url):
+        with self.lock:
+            host = self.host(url)
+            host["failed_at"] = time.time()
+            host["probed_at"] = time.time()
+
+    def needs_probe(self, url):
+        host = self.hosts.get(host_of(url))
+        return host is None or time.time() - host["probed_at"] > PROBE_TTL
+
+    def score(self, url):
+        # Estimated seconds to fetch SCORE_SIZE bytes; hosts that failed recently go last.
+        host = self.hosts.get(host_of(url))
+        if host is None:
+            return (0, 0)
+        if time.time() - host["failed_at"] < FAILURE_COOLDOWN:
+            return (1, host["failed_at"])
+        estimate = host["latency"] or 0
+        if host["throughput"]:
+            estimate += SCORE_SIZE / host["throughput"]
+        return (0, estimate)
+
+    def rank(self, urls, probe=True):
+        # Best first. Hosts with no recent numbers are probed in parallel with a
+        # one byte range request; without probing they keep their list order.
+        if len(urls) < 2:
+            return list(urls)
+        if probe:
+            stale = {host_of(url): url for url in urls if self.needs_probe(url)}
+            if stale:
+                import concurrent.futures
+                with concurrent.futures.ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                    futures = {executor.submit(scheduler.bind(probe_latency), url): url for url in stale.values()}
+                    for future in concurrent.futures.as_completed(futures):
+                        if future.exception() is None:
+                            self.record_latency(futures[future], future.result())
+                        else:
+                            self.record_failure(futures[future])
+                self.save_quietly()
+        return sorted(urls, key=self.score)
+
+    def save_quietly(self):
+        try:
+            self.save()
+        except OSError as e:
+            print("Error saving mirror statistics:", e)
+
+
+class MirrorList:
+    # The candidate URLs of one file, best first, moving down the list when a
+    # source fails or stalls.
+    def __init__(self, urls, stats):
+        self.urls = urls
+        self.stats = stats
+        self.index = 0
+
+    def current(self):
+        return self.urls[self.index]
+
+    def has_alternatives(self):
+        return len(self.urls) > 1
+
+    def fail_over(self):
+        # Returns False once every mirror was tried, the caller then waits before
+        # starting over from the best one.
+        self.stats.record_failure(self.current())
+        self.index = (self.index + 1) % len(self.urls)
+        return self.index != 0
+
+    def record_transfer(self, transferred, seconds):
+        self.stats.record_throughput(self.current(), transferred, seconds)
+        self.stats.save_quietly()
@@ -0,0 +1,354 @@
+import contextlib
+import threading
+import time
+import urllib.error
+import urllib.request
+import weakref
+
+INTERACTIVE = 0
+CATALOG = 1
+DOWNLOAD = 2
+PREFETCH = 3
+TRAFFIC_CLASSES = 4
+# Work that wasn't given a class, e.g. on a plain background thread.
+DEFAULT_TRAFFIC = CATALOG
+MAX_YIELD = 0.2
+ACTIVE_GAP = 0.05
+LIMITS_INTERVAL = 60
+POOL_IDLE_TIMEOUT = 60
+POOL_SIZE_PER_HOST = 8
+
+
+def minutes_of(clock):
+    hours, minutes = clock.split(":")
+    if not 0 <= int(hours) < 24 or not 0 <= int(minutes) < 60:
+        raise ValueError(f"{clock} is not a time of day")
+    return int(hours) * 60 + int(minutes)
+
+
+def checked_rule(rule):
+    # Raises ValueError for a bandwidth rule that can't be applied.
+    if not isinstance(rule, dict):
+        raise ValueError("a rule must be an object")
+    if ("from" in rule) != ("to" in rule):
+        raise ValueError("needs both from and to")
+    if "from" in rule:
+        minutes_of(rule["from"])
+        minutes_of(rule["to"])
+    for name in ("max_kb_per_s", "max_host_kb_per_s"):
+        value = rule.get(name, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"{name} must be a number of KiB/s")
+    return rule
+
+
+def rule_applies(rule, minute):
+    if "from" not in rule or "to" not in rule:
+        return True
+    start, end = minutes_of(rule["from"]), minutes_of(rule["to"])
+    if start <= end:
+        return start <= minute < end
+    # The window goes over midnight, e.g. 22:00 to 06:00.
+    return minute >= start or minute < end
+
+
+def limits_at(rules, now=None):
+    # Global and per host limits in bytes per second from the first rule that
+    # covers the time of day, 0 for no limit.
+    local_time = time.localtime(now)
+    minute = local_time.tm_hour * 60 + local_time.tm_min
+    for rule in rules:
+        if rule_applies(rule, minute):
+            return int(rule.get("max_kb_per_s", 0) * 1024), int(rule.get("max_host_kb_per_s", 0) * 1024)
+    return 0, 0
+
+
+class TokenBucket:
+    # Holds up to one second of traffic. Tokens may go negative, a big read is
+    # paid for by waiting afterwards. The scheduler's lock protects it.
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self, size):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= size
+        return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class Ticket:
+    def __init__(self, host, traffic):
+        self.host = host
+        self.traffic = traffic
+
+
+class ConnectionPool:
+    # Idle keep-alive connections by host, reused by the next request to it.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def get(self, key):
+        with self.lock:
+            connections = self.idle.get(key, [])
+            while connections:
+                connection, released = connections.pop()
+                if time.monotonic() - released < POOL_IDLE_TIMEOUT:
+                    return connection
+                connection.close()
+        return None
+
+    def put(self, key, connection):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < POOL_SIZE_PER_HOST:
+                connections.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+
+class ScheduledReader:
+    # Stands in for the socket file of a response: every read is paid for at
+    # the scheduler, and closing it hands the connection back to the pool when
+    # the whole body was read.
+    def __init__(self, fp, response, connection, key, ticket, scheduler):
+        self.fp = fp
+        self.response = weakref.ref(response)
+        self.connection = connection
+        self.key = key
+        self.ticket = ticket
+        self.scheduler = scheduler
+        self.closed = False
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+    def read(self, *args):
+        data = self.fp.read(*args)
+        self.scheduler.transfer(self.ticket, len(data))
+        return data
+
+    def read1(self, *args):
+        data = self.fp.read1(*args)
+        self.scheduler.transfer(self.ticket, len(data))
+        return data
+
+    def readline(self, *args):
+        data = self.fp.readline(*args)
+        self.scheduler.transfer(self.ticket, len(data))
+        return data
+
+    def readinto(self, buffer):
+        size = self.fp.readinto(buffer)
+        self.scheduler.transfer(self.ticket, size or 0)
+        return size
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.fp.close()
+        response = self.response()
+        if response is not None and response.length == 0 and not response.will_close and not response.chunked \
+                and self.connection.sock is not None:
+            self.scheduler.pool.put(self.key, self.connection)
+        else:
+            self.connection.close()
+
+
+class PooledConnections:
+    # do_open of urllib's HTTP handlers without "Connection: close", so every
+    # urlopen call in the launcher shares keep-alive connections per host.
+    def __init__(self, scheduler, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    def do_open(self, http_class, req, **http_conn_args):
+        if req._tunnel_host or not req.host:
+            return super().do_open(http_class, req, **http_conn_args)
+        key = (http_class, req.host)
+        headers = dict(req.unredirected_hdrs)
+        headers.update({name: value for name, value in req.headers.items() if name not in headers})
+        headers = {name.title(): value for name, value in headers.items()}
+        ticket = self.scheduler.open(req.host)
+        connection, response = self.send(key, http_class, req, headers, http_conn_args)
+        response.fp = ScheduledReader(response.fp, response, connection, key, ticket, self.scheduler)
+        response.url = req.get_full_url()
+        response.msg = response.reason
+        return response
+
+    def send(self, key, http_class, req, headers, http_conn_args):
+        connection = self.scheduler.pool.get(key)
+        if connection is not None:
+            if isinstance(req.timeout, (int, float)):
+                connection.timeout = req.timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(req.timeout)
+            try:
+                connection.request(req.get_method(), req.selector, req.data, headers,
+                                   encode_chunked=req.has_header("Transfer-encoding"))
+                return connection, connection.getresponse()
+            except ConnectionError:
+                # The server dropped the idle connection, try once on a new one.
+                connection.close()
+            except BaseException:
+                connection.close()
+                raise
+        connection = http_class(req.host, timeout=req.timeout, **http_conn_args)
+        try:
+            try:
+                connection.request(req.get_method(), req.selector, req.data, headers,
+                                   encode_chunked=req.has_header("Transfer-encoding"))
+            except OSError as e:
+                raise urllib.error.URLError(e)
+            return connection, connection.getresponse()
+        except BaseException:
+            connection.close()
+            raise
+
+
+class PooledHTTPHandler(PooledConnections, urllib.request.HTTPHandler):
+    pass
+
+
+class PooledHTTPSHandler(PooledConnections, urllib.request.HTTPSHandler):
+    pass
+
+
+class Scheduler:
+    # Shared by all network and disk work. Requests belong to a traffic class
+    # (interactive > catalog > download > prefetch): lower classes give way
+    # while more important requests are moving bytes, and when a bandwidth
+    # limit is set they also pay for the more important traffic. Limits are global
+    # and per host and can change with the time of day. Disk-heavy jobs take
+    # one of a fixed number of slots.
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.pool = ConnectionPool()
+        self.rules = []
+        self.limits = (0, 0)
+        self.limits_checked = 0
+        self.global_bucket = None
+        self.host_buckets = {}
+        # When each class last moved bytes.
+        self.moved = [0.0] * TRAFFIC_CLASSES
+        self.disk_slots = None
+        self.installed = False
+
+    def configure(self, rules=(), disk_jobs=0):
+        # A bad rule is left out here, transfer() only sees rules that apply.
+        checked = []
+        for rule in rules:
+            try:
+                checked.append(checked_rule(rule))
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"Ignoring bandwidth limit {rule}:", e)
+        with self.condition:
+            self.rules = checked
+            self.limits_checked = 0
+            self.disk_slots = threading.BoundedSemaphore(disk_jobs) if disk_jobs else None
+        if not self.installed:
+            urllib.request.install_opener(urllib.request.build_opener(PooledHTTPHandler(self),
+                                                                      PooledHTTPSHandler(self)))
+            self.installed = True
+
+    def current_traffic(self):
+        return getattr(self.local, "traffic", DEFAULT_TRAFFIC)
+
+    @contextlib.contextmanager
+    def traffic_class(self, traffic):
+        previous = self.current_traffic()
+        self.local.traffic = traffic
+        try:
+            yield
+        finally:
+            self.local.traffic = previous
+
+    def bind(self, fn, traffic=None):
+        # fn runs in the given traffic class, by default the caller's, also
+        # when it is called on another thread.
+        traffic = self.current_traffic() if traffic is None else traffic
+
+        def run(*args, **kwargs):
+            with self.traffic_class(traffic):
+                return fn(*args, **kwargs)
+        return run
+
+    def open(self, host):
+        return Ticket(host, self.current_traffic())
+
+    def transfer(self, ticket, size):
+        # A read waits until the more important classes have been quiet for
+        # ACTIVE_GAP, at most MAX_YIELD, so it gives way for as long as they
+        # actually move bytes. A response that is open but idle holds nobody up.
+        if not size:
+            return
+        started = time.monotonic()
+        with self.condition:
+            deadline = started + MAX_YIELD
+            while True:
+                now = time.monotonic()
+                quiet_at = max(self.moved[:ticket.traffic], default=0.0) + ACTIVE_GAP
+                if quiet_at <= now or deadline <= now:
+                    break
+                self.condition.wait(min(quiet_at, deadline) - now)
+            self.moved[ticket.traffic] = time.monotonic()
+            wait = self.bucket_wait(ticket, size)
+        if wait > 0:
+            time.sleep(wait)
+        self.local.waited = self.waited_seconds() + time.monotonic() - started
+
+    def bucket_wait(self, ticket, size):
+        now = time.time()
+        if now - self.limits_checked >= LIMITS_INTERVAL:
+            self.limits_checked = now
+            limits = limits_at(self.rules, now)
+            if limits != self.limits:
+                self.limits = limits
+                self.global_bucket = TokenBucket(limits[0]) if limits[0] else None
+                self.host_buckets = {}
+        buckets = []
+        if self.global_bucket is not None:
+            buckets.append(self.global_bucket)
+        if self.limits[1]:
+            if ticket.host not in self.host_buckets:
+                self.host_buckets[ticket.host] = TokenBucket(self.limits[1])
+            buckets.append(self.host_buckets[ticket.host])
+        if not buckets:
+            return 0
+        wait = max(bucket.take(size) for bucket in buckets)
+        if ticket.traffic < DOWNLOAD:
+            # Important traffic only waits for its own bytes.
+            wait = min(wait, size / min(bucket.rate for bucket in buckets))
+        return wait
+
+    def waited_seconds(self):
+        # Time this thread was held back, so slow transfers aren't taken for stalls.
+        return getattr(self.local, "waited", 0.0)
+
+    @contextlib.contextmanager
+    def disk_job(self, should_stop=None):
+        # Nested use on one thread takes a single slot. A stopped caller goes
+        # ahead without one, it returns right away anyway.
+        slots = self.disk_slots
+        depth = getattr(self.local, "disk_depth", 0)
+        acquired = False
+        if slots is not None and depth == 0:
+            while not acquired:
+                acquired = slots.acquire(timeout=0.2)
+                if not acquired and should_stop is not None and should_stop():
+                    break
+        self.local.disk_depth = depth + 1
+        try:
+            yield
+        finally:
+            self.local.disk_depth = depth
+            if acquired:
+                slots.release()
+
+
+scheduler = Scheduler()
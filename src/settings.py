@@ -0,0 +1,29 @@
+import json
+
+SETTINGS_PATH = "settings.alauncher"
+DEFAULT_SETTINGS = {
+    "download_connections": 4,
+    "extraction_processes": 0,
+    "streaming_install": False,
+    "archive_cache": False,
+    "archive_cache_path": "archive_cache",
+    "archive_cache_budget_mb": 10240,
+    "mirrors": {},
+    "pause_while_playing": True,
+    "bandwidth_limits": [],
+    "disk_jobs": 1,
+    "metrics": True,
+    "metrics_prometheus_path": "",
+}
+
+
+def load_settings(path=SETTINGS_PATH):
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, "r") as settings_file:
+            settings.update(json.load(settings_file))
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        print("Error reading settings, using defaults:", e)
+    return settings
@@ -0,0 +1,23 @@
+import time
+
+
+class StartupProfiler:
+    # Splits startup into phases; each mark() closes the phase since the last one.
+    def __init__(self, enabled=False, started=None):
+        self.enabled = enabled
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup phases:")
+        for phase, seconds in self.phases:
+            print(f"  {phase:<18}{seconds * 1000:8.1f} ms")
+        print(f"  {'total':<18}{(self.last - self.started) * 1000:8.1f} ms")
@@ -0,0 +1,248 @@
+import io
+import os
+import shutil
+import struct
+import tarfile
+import time
+import urllib.parse
+import urllib.request
+import zipfile
+import zlib
+
+from src.extraction import STAGING_FOLDER, ExtractionCanceled, member_target, move_into_place
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PROGRESS_INTERVAL = 0.1
+ZIP_TAIL_SIZE = (1 << 16) + 1024
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+TAR_MODES = {
+    ".tar": "r|",
+    ".tar.gz": "r|gz",
+    ".tgz": "r|gz",
+    ".tar.bz2": "r|bz2",
+    ".tar.xz": "r|xz",
+}
+ZSTD_SUFFIXES = (".tar.zst", ".tzst")
+
+
+class StreamingNotSupported(Exception):
+    pass
+
+
+class TailTooShort(Exception):
+    def __init__(self, offset):
+        super().__init__(f"Central directory starts before byte {offset}")
+        self.offset = offset
+
+
+def stream_format_for(url):
+    name = os.path.basename(urllib.parse.urlparse(url).path).lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith(ZSTD_SUFFIXES):
+        return "tar.zst" if zstandard is not None else None
+    for suffix in TAR_MODES:
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+class ProgressReader(io.RawIOBase):
+    # Wraps the HTTP response: counts bytes, reports progress and checks for cancel.
+    def __init__(self, response, total, progress_callback, should_stop, position=0):
+        super().__init__()
+        self.response = response
+        self.total = total
+        self.progress_callback = progress_callback
+        self.should_stop = should_stop
+        self.position = position
+        self.last_report = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.should_stop():
+            raise ExtractionCanceled()
+        size = self.response.readinto(buffer)
+        self.position += size
+        now = time.monotonic()
+        if self.progress_callback is not None and now - self.last_report >= PROGRESS_INTERVAL:
+            self.progress_callback(self.position, self.total)
+            self.last_report = now
+        return size
+
+    def read_exact(self, size):
+        data = self.read(size)
+        while len(data) < size:
+            chunk = self.read(size - len(data))
+            if not chunk:
+                raise EOFError(f"Archive ended {size - len(data)} bytes early")
+            data += chunk
+        return data
+
+    def skip_to(self, offset):
+        while self.position < offset:
+            if not self.read(min(offset - self.position, 1 << 20)):
+                raise EOFError("Archive ended early")
+
+
+class TailFile(io.RawIOBase):
+    # A seekable view of the end of a remote file, enough for ZipFile to read
+    # the central directory without the rest of the archive.
+    def __init__(self, start, data, size):
+        super().__init__()
+        self.start = start
+        self.data = data
+        self.size = size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.pos = offset
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        if self.pos < self.start:
+            raise TailTooShort(self.pos)
+        begin = self.pos - self.start
+        end = len(self.data) if size is None or size < 0 else begin + size
+        chunk = self.data[begin:end]
+        self.pos += len(chunk)
+        return chunk
+
+
+def fetch_range(url, range_header, timeout=30):
+    request = urllib.request.Request(url)
+    request.add_header("Range", range_header)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206:
+            raise StreamingNotSupported("Server does not serve byte ranges")
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if not total.isdigit():
+            raise StreamingNotSupported("Server did not report the archive size")
+        return response.read(), int(total)
+
+
+def read_zip_directory(url, timeout=30):
+    data, total = fetch_range(url, f"bytes=-{ZIP_TAIL_SIZE}", timeout)
+    start = total - len(data)
+    while True:
+        try:
+            return zipfile.ZipFile(TailFile(start, data, total)).infolist(), total
+        except TailTooShort as e:
+            more, _ = fetch_range(url, f"bytes={e.offset}-{start - 1}", timeout)
+            data = more + data
+            start = e.offset
+
+
+def stream_zip_members(reader, infos, staging):
+    for info in sorted(infos, key=lambda info: info.header_offset):
+        target = member_target(staging, info.filename)
+        reader.skip_to(info.header_offset)
+        header = LOCAL_HEADER.unpack(reader.read_exact(LOCAL_HEADER.size))
+        if header[0] != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+        reader.read_exact(header[9] + header[10])
+        if target is None:
+            continue
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            continue
+        if info.flag_bits & 0x1:
+            raise StreamingNotSupported(f"{info.filename} is encrypted")
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            decompressor = zlib.decompressobj(-15)
+        elif info.compress_type == zipfile.ZIP_STORED:
+            decompressor = None
+        else:
+            raise StreamingNotSupported(f"{info.filename} uses compression method {info.compress_type}")
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        crc = 0
+        remaining = info.compress_size
+        with open(target, "wb") as target_file:
+            while remaining:
+                chunk = reader.read(min(remaining, 1 << 20))
+                if not chunk:
+                    raise EOFError(f"Archive ended inside {info.filename}")
+                remaining -= len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                target_file.write(chunk)
+                crc = zlib.crc32(chunk, crc)
+            if decompressor is not None:
+                chunk = decompressor.flush()
+                target_file.write(chunk)
+                crc = zlib.crc32(chunk, crc)
+        if crc != info.CRC:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for {info.filename}")
+
+
+def stream_tar_members(fileobj, mode, staging):
+    with tarfile.open(fileobj=fileobj, mode=mode) as archive:
+        for member in archive:
+            member = tarfile.data_filter(member, staging)
+            if not member.isreg():
+                archive.extract(member, staging, filter="data")
+                continue
+            target = os.path.join(staging, member.name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with archive.extractfile(member) as source, open(target, "wb") as target_file:
+                shutil.copyfileobj(source, target_file, 1 << 20)
+            if member.mode is not None:
+                os.chmod(target, member.mode)
+
+
+def stream_install(url, destination, progress_callback=None, should_stop=None, timeout=30):
+    # Unpacks the archive while it downloads, without writing it to disk first.
+    # Zip archives need a Range request for the central directory up front.
+    stream_format = stream_format_for(url)
+    if stream_format is None:
+        raise StreamingNotSupported(f"Can't stream {os.path.basename(url)}")
+    should_stop = should_stop or (lambda: None)
+    infos = None
+    if stream_format == "zip":
+        infos, _ = read_zip_directory(url, timeout)
+
+    staging = os.path.join(destination, STAGING_FOLDER)
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            length = response.headers.get("Content-Length")
+            reader = ProgressReader(response, int(length) if length else 0, progress_callback, should_stop)
+            if stream_format == "zip":
+                stream_zip_members(reader, infos, staging)
+            elif stream_format == "tar.zst":
+                decompressed = zstandard.ZstdDecompressor().stream_reader(io.BufferedReader(reader, 1 << 20))
+                stream_tar_members(decompressed, "r|", staging)
+            else:
+                stream_tar_members(io.BufferedReader(reader, 1 << 20), TAR_MODES[stream_format], staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    move_into_place(staging, destination)
+    if progress_callback is not None:
+        # Zip streams stop after the last member, before the central directory.
+        progress_callback(reader.total or reader.position, reader.total or reader.position)
+    return destination
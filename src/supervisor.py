@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from PyQt5.QtCore import QObject, QSocketNotifier, QThreadPool, pyqtSignal
+
+from src.metrics import metrics
+from src.workers import run_in_background
+
+PLAYTIME_PATH = "playtime.alauncher"
+SESSIONS_KEPT = 20
+
+
+def open_pidfd(pid):
+    # A pidfd turns readable when the process exits, so Qt's event loop can
+    # watch it like a socket. Needs Linux 5.3 and Python 3.9.
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        return os.pidfd_open(pid)
+    except OSError:
+        return None
+
+
+def reap(process):
+    # wait4 hands back the finished child's resource usage as well, so peak
+    # memory and CPU time come without sampling the process while it runs.
+    if hasattr(os, "wait4"):
+        try:
+            pid, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            pass
+        else:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+            return {"exit_code": process.returncode, "peak_rss": peak_rss,
+                    "cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 3)}
+    return {"exit_code": process.wait(), "peak_rss": None, "cpu_seconds": None}
+
+
+class GameSession:
+    def __init__(self, game_id, process, spawn_seconds):
+        self.game_id = game_id
+        self.process = process
+        self.spawn_seconds = spawn_seconds
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.pidfd = None
+        self.notifier = None
+
+
+class GameSupervisor(QObject):
+    # Starts games and notices when they exit: through a pidfd on Linux and a
+    # thread blocked in wait() elsewhere, never a polling timer. Playtime and
+    # the resources of every session are kept in playtime.alauncher.
+    game_started = pyqtSignal(object)
+    game_exited = pyqtSignal(object, object)
+    running_changed = pyqtSignal(bool)
+
+    def __init__(self, path=PLAYTIME_PATH, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.sessions = {}
+        self.playtime = self.load()
+        # Waiters block for the whole session, keep them off the global pool.
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(16)
+
+    def load(self):
+        try:
+            with open(self.path, "r") as playtime_file:
+                return json.load(playtime_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print("Error reading playtime:", e)
+            return {}
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as playtime_file:
+            json.dump(self.playtime, playtime_file)
+        os.replace(temp_path, self.path)
+
+    def is_running(self, game_id):
+        return game_id in self.sessions
+
+    def any_running(self):
+        return bool(self.sessions)
+
+    def total_playtime(self, game_id):
+        return self.playtime.get(str(game_id), {}).get("seconds", 0)
+
+    def launch(self, game_id, executable_path):
+        # Returns False when the game is already running or can't be started.
+        if game_id in self.sessions:
+            print(f"Game {game_id} is already running")
+            return False
+        started = time.perf_counter()
+        # No shell, so the process we watch is the game itself. Without one, a
+        # script lacking a shebang or the executable bit fails here.
+        try:
+            process = subprocess.Popen([os.path.abspath(executable_path)])
+        except OSError as e:
+            print(f"Error starting game {game_id}:", e)
+            return False
+        # Only the fork and exec, the game's own start up isn't visible from here.
+        spawn_seconds = time.perf_counter() - started
+        metrics.observe("game_spawn_seconds", spawn_seconds)
+        session = GameSession(game_id, process, spawn_seconds)
+        self.sessions[game_id] = session
+        session.pidfd = open_pidfd(process.pid)
+        if session.pidfd is not None:
+            session.notifier = QSocketNotifier(session.pidfd, QSocketNotifier.Read, self)
+            session.notifier.activated.connect(lambda fd, game_id=game_id: self.on_exited(game_id, reap(process)))
+        else:
+            run_in_background(reap, process, pool=self.pool,
+                              on_finished=lambda usage, game_id=game_id: self.on_exited(game_id, usage))
+        self.game_started.emit(game_id)
+        if len(self.sessions) == 1:
+            self.running_changed.emit(True)
+        return True
+
+    def on_exited(self, game_id, usage):
+        session = self.sessions.pop(game_id, None)
+        if session is None:
+            return
+        if session.notifier is not None:
+            session.notifier.setEnabled(False)
+            session.notifier.deleteLater()
+            os.close(session.pidfd)
+        seconds = round(time.monotonic() - session.started, 1)
+        record = {"started_at": session.started_at, "seconds": seconds,
+                  "spawn_seconds": round(session.spawn_seconds, 4), **usage}
+        metrics.observe("game_session_seconds", seconds)
+        if usage["peak_rss"] is not None:
+            metrics.observe("game_peak_rss_bytes", usage["peak_rss"])
+            metrics.observe("game_cpu_seconds", usage["cpu_seconds"])
+        game = self.playtime.setdefault(str(game_id), {"seconds": 0, "sessions": []})
+        game["seconds"] += seconds
+        game["sessions"] = (game["sessions"] + [record])[-SESSIONS_KEPT:]
+        try:
+            self.save()
+        except OSError as e:
+            print("Error saving playtime:", e)
+        print(f"Game {game_id} exited after {seconds} s with code {usage['exit_code']}")
+        self.game_exited.emit(game_id, record)
+        if not self.sessions:
+            self.running_changed.emit(False)
@@ -0,0 +1,73 @@
+import importlib.util
+import json
+import os
+
+from PyQt5.QtCore import QDir
+from PyQt5.QtGui import QColor, QFontDatabase, QGuiApplication, QPalette
+
+THEME = "dark_blue.xml"
+THEME_CACHE_PATH = "theme_cache.alauncher"
+SEARCH_PATH_PREFIXES = ("icon",)
+
+
+def theme_cache_key(theme):
+    # find_spec locates qt_material without importing it (and jinja2 with it).
+    spec = importlib.util.find_spec("qt_material")
+    if spec is None or spec.origin is None:
+        return None
+    return f"{theme}:{spec.origin}:{os.path.getmtime(spec.origin)}"
+
+
+def load_theme_cache(theme, path=THEME_CACHE_PATH):
+    try:
+        with open(path, "r") as cache_file:
+            cache = json.load(cache_file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if cache.get("key") != theme_cache_key(theme):
+        return None
+    # The themed icons live in qt_material's folder in the home directory.
+    for paths in cache["search_paths"].values():
+        if not all(os.path.isdir(search_path) for search_path in paths):
+            return None
+    return cache
+
+
+def save_theme_cache(widget, theme, path=THEME_CACHE_PATH):
+    import qt_material
+    fonts_folder = os.path.join(os.path.dirname(qt_material.__file__), "fonts", "roboto")
+    cache = {
+        "key": theme_cache_key(theme),
+        "stylesheet": widget.styleSheet(),
+        "search_paths": {prefix: QDir.searchPaths(prefix) for prefix in SEARCH_PATH_PREFIXES},
+        "fonts": sorted(os.path.join(fonts_folder, name) for name in os.listdir(fonts_folder) if name.endswith(".ttf")),
+        "placeholder_color": QGuiApplication.palette().color(QPalette.PlaceholderText).name(QColor.HexArgb),
+    }
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as cache_file:
+        json.dump(cache, cache_file)
+    os.replace(temp_path, path)
+
+
+def apply_theme(widget, theme=THEME, cache_path=THEME_CACHE_PATH):
+    # qt_material renders its stylesheet through jinja2 on every start, which is
+    # most of the time before the first frame. The result only depends on the
+    # theme, so it is rendered once and replayed from the cache afterwards.
+    cache = load_theme_cache(theme, cache_path)
+    if cache is None:
+        from qt_material import apply_stylesheet
+        apply_stylesheet(widget, theme=theme)
+        try:
+            save_theme_cache(widget, theme, cache_path)
+        except OSError as e:
+            print("Error caching the theme:", e)
+        return
+
+    for font_path in cache["fonts"]:
+        QFontDatabase.addApplicationFont(font_path)
+    for prefix, paths in cache["search_paths"].items():
+        QDir.setSearchPaths(prefix, paths)
+    palette = QGuiApplication.palette()
+    palette.setColor(QPalette.PlaceholderText, QColor(cache["placeholder_color"]))
+    QGuiApplication.setPalette(palette)
+    widget.setStyleSheet(cache["stylesheet"])
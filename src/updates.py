@@ -0,0 +1,47 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from src.install_state import version_is_older
+from src.workers import run_in_background
+
+
+def find_outdated_games(games, installed_versions):
+    # installed_versions is a snapshot of {folder name: version}, so this can
+    # run off the GUI thread while installs keep changing the live index.
+    outdated = set()
+    for game in games:
+        installed_version = installed_versions.get(str(game["ID"]))
+        if installed_version is None:
+            continue
+        try:
+            if version_is_older(installed_version, game.get("version", "0.0.0")):
+                outdated.add(game["ID"])
+        except ValueError as e:
+            print(f"Can't compare versions of {game['name']}:", e)
+    return outdated
+
+
+class UpdateChecker(QObject):
+    updates_changed = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.outdated = set()
+        self.generation = 0
+
+    def check(self, games, install_state):
+        # Only the newest pass is applied when checks overlap.
+        self.generation += 1
+        generation = self.generation
+        installed_versions = {key: entry["version"] for key, entry in install_state.games.items()}
+        run_in_background(find_outdated_games, list(games), installed_versions,
+                          on_finished=lambda outdated: self.on_checked(generation, outdated),
+                          on_failed=lambda error: print("Error checking for updates:", error))
+
+    def on_checked(self, generation, outdated):
+        if generation != self.generation or outdated == self.outdated:
+            return
+        self.outdated = outdated
+        self.updates_changed.emit(outdated)
+
+    def is_outdated(self, game_id):
+        return game_id in self.outdated
@@ -0,0 +1,190 @@
+import hashlib
+import mmap
+import os
+import time
+import zlib
+
+from src.extraction import (ExtractionCanceled, member_target, pool_worker_progress, pool_worker_stopped,
+                            run_in_processes)
+from src.scheduler import scheduler
+
+PROGRESS_INTERVAL = 0.1
+READ_SIZE = 1 << 20
+MMAP_MIN_SIZE = 16 << 20
+MMAP_STEP = 8 << 20
+PARALLEL_MIN_SIZE = 64 << 20
+
+
+class VerifyNotPossible(Exception):
+    pass
+
+
+def expected_files_from_zip(infos):
+    return [{"path": info.filename, "size": info.file_size, "crc32": info.CRC}
+            for info in infos if not info.is_dir()]
+
+
+def expected_files(manifest_url, archive_url, game_folder, timeout=30):
+    # What the game folder should hold: the published file manifest, else the
+    # CRC-32s in the archive's central directory, else the manifest saved by
+    # the last delta update.
+    from src.delta import fetch_manifest, load_installed_manifest
+    from src.streaming import StreamingNotSupported, read_zip_directory
+    if manifest_url is not None:
+        try:
+            return fetch_manifest(manifest_url, timeout)["files"]
+        except (OSError, ValueError, KeyError) as e:
+            print("Can't read the file manifest:", e)
+    if archive_url is not None and archive_url.endswith(".zip"):
+        try:
+            return expected_files_from_zip(read_zip_directory(archive_url, timeout)[0])
+        except (OSError, ValueError, StreamingNotSupported) as e:
+            print("Can't read the archive's file list:", e)
+    installed_manifest = load_installed_manifest(game_folder)
+    if installed_manifest is not None:
+        return installed_manifest["files"]
+    raise VerifyNotPossible("No file list to check the game against")
+
+
+def progress_reporter(total, progress_callback):
+    # report(size) for hash_file, calling progress_callback(done, total) at most every PROGRESS_INTERVAL.
+    state = {"done": 0, "last_report": 0}
+
+    def report(size):
+        state["done"] += size
+        now = time.monotonic()
+        if progress_callback is not None and now - state["last_report"] >= PROGRESS_INTERVAL:
+            progress_callback(state["done"], total)
+            state["last_report"] = now
+    return report
+
+
+def hash_file(path, algorithm="sha256", report=None, should_stop=None):
+    # The one file hasher of the launcher, used for file checks, delta updates
+    # and archives. Big files are mapped instead of read, the hash then works on
+    # the page cache directly. Runs in a disk job slot and raises
+    # ExtractionCanceled when stopped.
+    if algorithm == "crc32":
+        crc = [0]
+
+        def update(data):
+            crc[0] = zlib.crc32(data, crc[0])
+    else:
+        digest = hashlib.sha256()
+        update = digest.update
+    size = os.path.getsize(path)
+    with scheduler.disk_job(should_stop), open(path, "rb") as game_file:
+        if size >= MMAP_MIN_SIZE:
+            with mmap.mmap(game_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, MMAP_STEP):
+                        if should_stop is not None and should_stop():
+                            raise ExtractionCanceled()
+                        chunk = view[offset:offset + MMAP_STEP]
+                        update(chunk)
+                        chunk.release()
+                        if report is not None:
+                            report(min(MMAP_STEP, size - offset))
+                finally:
+                    view.release()
+        else:
+            while True:
+                if should_stop is not None and should_stop():
+                    raise ExtractionCanceled()
+                chunk = game_file.read(READ_SIZE)
+                if not chunk:
+                    break
+                update(chunk)
+                if report is not None:
+                    report(len(chunk))
+    return crc[0] if algorithm == "crc32" else digest.hexdigest()
+
+
+def check_file(game_folder, entry, report=None, should_stop=None):
+    # Returns what is wrong with one expected file, or None.
+    target = member_target(game_folder, entry["path"])
+    if target is None:
+        return None
+    if not os.path.isfile(target):
+        return "is missing"
+    if os.path.getsize(target) != entry["size"]:
+        return "has the wrong size"
+    if "sha256" in entry:
+        if hash_file(target, "sha256", report, should_stop) != entry["sha256"]:
+            return "is damaged"
+    elif "crc32" in entry:
+        if hash_file(target, "crc32", report, should_stop) != entry["crc32"]:
+            return "is damaged"
+    return None
+
+
+def check_files_in_worker(game_folder, entries):
+    # Runs in a worker process of run_in_processes.
+    report, flush = pool_worker_progress()
+    problems = []
+    for entry in entries:
+        problem = check_file(game_folder, entry, report, pool_worker_stopped)
+        if problem is not None:
+            problems.append((entry, problem))
+    flush()
+    return problems
+
+
+def split_entries(entries, parts):
+    # Biggest files first, each to the least loaded worker.
+    groups = [[] for _ in range(parts)]
+    sizes = [0] * parts
+    for entry in sorted(entries, key=lambda entry: entry["size"], reverse=True):
+        smallest = sizes.index(min(sizes))
+        groups[smallest].append(entry)
+        sizes[smallest] += entry["size"]
+    return [group for group in groups if group]
+
+
+def check_files_serial(game_folder, entries, total, progress_callback, should_stop):
+    report = progress_reporter(total, progress_callback)
+    problems = []
+    for entry in entries:
+        problem = check_file(game_folder, entry, report, should_stop)
+        if problem is not None:
+            problems.append((entry, problem))
+    return problems
+
+
+def check_files_parallel(game_folder, entries, total, processes, progress_callback, should_stop):
+    results = run_in_processes(check_files_in_worker,
+                               [(game_folder, group) for group in split_entries(entries, processes)],
+                               total, progress_callback, should_stop)
+    return [problem for problems in results for problem in problems]
+
+
+def find_damaged_files(game_folder, entries, progress_callback=None, should_stop=None, processes=0):
+    # Hashes every expected file and returns (entry, problem) for the ones that
+    # are missing or differ. Progress is reported in bytes hashed.
+    should_stop = should_stop or (lambda: None)
+    processes = processes or os.cpu_count() or 1
+    total = sum(entry["size"] for entry in entries)
+    with scheduler.disk_job(should_stop):
+        if processes > 1 and len(entries) > 1 and total >= PARALLEL_MIN_SIZE:
+            problems = check_files_parallel(game_folder, entries, total, min(processes, len(entries)),
+                                            progress_callback, should_stop)
+        else:
+            problems = check_files_serial(game_folder, entries, total, progress_callback, should_stop)
+    if progress_callback is not None:
+        progress_callback(total, total)
+    return problems
+
+
+def repair_game(manifest_url, archive_url, game_folder, progress_callback=None, should_stop=None, on_phase=None):
+    # Checks the installed files and fetches only the damaged or missing ones.
+    from src.delta import fetch_files
+    entries = expected_files(manifest_url, archive_url, game_folder)
+    if on_phase is not None:
+        on_phase("verify")
+    damaged = [entry for entry, problem in find_damaged_files(game_folder, entries, progress_callback, should_stop)]
+    print(f"Repairing {len(damaged)} damaged or missing files")
+    if on_phase is not None:
+        on_phase("repair")
+    fetch_files(damaged, manifest_url, archive_url, game_folder, progress_callback, should_stop)
+    return game_folder
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+
+@pytest.fixture
+def serve():
+    # serve(files, latency=..., bandwidth=...) starts a local stand-in server.
+    from server import StandInServer
+    servers = []
+
+    def start(files, **kwargs):
+        servers.append(StandInServer(files, **kwargs).start())
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
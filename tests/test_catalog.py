@@ -0,0 +1,95 @@
+import copy
+import json
+import os
+
+from src import catalog
+from src.catalog import apply_catalog_changes, catalog_changes, load_local_catalog, sync_catalog
+
+OLD = {"revision": 1, "games": [{"ID": 1, "name": "One"}, {"ID": 2, "name": "Two"}, {"ID": 3, "name": "Three"}]}
+NEW = {"revision": 2, "games": [{"ID": 1, "name": "One, remastered"}, {"ID": 3, "name": "Three"},
+                                {"ID": 4, "name": "Four"}]}
+
+
+def as_bytes(data):
+    return json.dumps(data, indent=2).encode()
+
+
+def publish(server, data, oldest=1, sizes=None):
+    # games.json, changes/revision.json and the change files, the way tools/publish_catalog.py lays them out.
+    server.add_file("/games.json", as_bytes(data))
+    revision = {"revision": data["revision"], "oldest": oldest}
+    if sizes is not None:
+        revision["sizes"] = sizes
+    server.add_file("/changes/revision.json", as_bytes(revision))
+
+
+def start(serve, tmp_path, monkeypatch):
+    server = serve({})
+    publish(server, OLD)
+    paths = str(tmp_path / "games.json"), str(tmp_path / "catalog_cache.alauncher")
+    assert sync_catalog(server.url("/games.json"), *paths) == OLD
+    full_fetches = []
+    fetch_catalog = catalog.fetch_catalog
+
+    def counting_fetch_catalog(*args, **kwargs):
+        full_fetches.append(args[0])
+        return fetch_catalog(*args, **kwargs)
+    monkeypatch.setattr(catalog, "fetch_catalog", counting_fetch_catalog)
+    return server, paths, full_fetches
+
+
+def test_changes_cover_added_removed_and_modified_games():
+    changes = catalog_changes(OLD, NEW, 2)
+    assert changes == {"revision": 2, "games": [{"ID": 1, "name": "One, remastered"}, {"ID": 4, "name": "Four"}],
+                       "removed": [2]}
+    data = copy.deepcopy(OLD)
+    apply_catalog_changes(data, changes)
+    assert data == NEW
+
+
+def test_sync_applies_published_changes(serve, tmp_path, monkeypatch):
+    server, paths, full_fetches = start(serve, tmp_path, monkeypatch)
+    server.add_file("/changes/2.json", as_bytes(catalog_changes(OLD, NEW, 2)))
+    publish(server, NEW)
+    assert sync_catalog(server.url("/games.json"), *paths) == NEW
+    assert load_local_catalog(paths[0]) == NEW
+    assert full_fetches == []
+
+
+def test_unchanged_sync_leaves_the_local_copy_alone(serve, tmp_path, monkeypatch):
+    server, paths, full_fetches = start(serve, tmp_path, monkeypatch)
+    modified = os.stat(paths[0]).st_mtime_ns
+    assert sync_catalog(server.url("/games.json"), *paths) is None
+    assert os.stat(paths[0]).st_mtime_ns == modified
+    # The first check stored the ETag of revision.json, later ones write nothing.
+    modified = os.stat(paths[0]).st_mtime_ns, os.stat(paths[1]).st_mtime_ns
+    assert sync_catalog(server.url("/games.json"), *paths) is None
+    assert (os.stat(paths[0]).st_mtime_ns, os.stat(paths[1]).st_mtime_ns) == modified
+    assert full_fetches == []
+
+
+def test_revision_gap_fetches_the_whole_list(serve, tmp_path, monkeypatch):
+    server, paths, full_fetches = start(serve, tmp_path, monkeypatch)
+    newer = dict(NEW, revision=3)
+    server.add_file("/changes/3.json", as_bytes(catalog_changes(NEW, newer, 3)))
+    # changes/2.json is no longer published, revision 1 can't catch up from it.
+    publish(server, newer, oldest=3)
+    assert sync_catalog(server.url("/games.json"), *paths) == newer
+    assert load_local_catalog(paths[0]) == newer
+    assert len(full_fetches) == 1
+
+
+def test_changes_bigger_than_the_list_fetch_the_whole_list(serve, tmp_path, monkeypatch):
+    server, paths, full_fetches = start(serve, tmp_path, monkeypatch)
+    server.add_file("/changes/2.json", as_bytes(catalog_changes(OLD, NEW, 2)))
+    publish(server, NEW, sizes={"2": os.path.getsize(paths[0]) + 1})
+    assert sync_catalog(server.url("/games.json"), *paths) == NEW
+    assert len(full_fetches) == 1
+
+
+def test_unpublished_edit_fetches_the_whole_list(serve, tmp_path, monkeypatch):
+    server, paths, full_fetches = start(serve, tmp_path, monkeypatch)
+    edited = dict(OLD, games=OLD["games"] + [{"ID": 5, "name": "Hand edit"}])
+    server.add_file("/games.json", as_bytes(edited))
+    assert sync_catalog(server.url("/games.json"), *paths) == edited
+    assert len(full_fetches) == 1
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import random
+
+import pytest
+
+import server as stand_in
+from src import downloads
+from src.downloads import DownloadJob, DownloadStopped, part_path_for, run_download_job, segments_path_for
+
+DATA = random.Random(1).randbytes(512 << 10)
+CHANGED = random.Random(2).randbytes(512 << 10)
+# Per connection, so the four segments take about half a second.
+BANDWIDTH = 256 << 10
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    # Segment every download, save the segment state on every progress report
+    # and keep the byte totals the download reports. Small chunks from the
+    # server give the segments a chance to notice a pause.
+    monkeypatch.setattr(stand_in, "CHUNK_SIZE", 8 << 10)
+    monkeypatch.setattr(downloads, "SEGMENT_MIN_SIZE", 1)
+    monkeypatch.setattr(downloads, "SEGMENT_STATE_INTERVAL", 0)
+    totals = []
+    monkeypatch.setattr(downloads, "record_download", lambda mode, started, transferred: totals.append(transferred))
+    return totals
+
+
+def download(server, local_path, data):
+    job = DownloadJob({"ID": 1}, server.url("/game.zip"), local_path, sha256=hashlib.sha256(data).hexdigest())
+    return run_download_job(job, connections=4)
+
+
+def download_part_of(server, local_path):
+    # Pauses the download once an eighth of it arrived, returns what its saved segments hold.
+    done = [0]
+
+    def progress(received, total):
+        done[0] = received
+
+    def should_stop():
+        return "pause" if done[0] >= len(DATA) // 8 else None
+    job = DownloadJob({"ID": 1}, server.url("/game.zip"), local_path)
+    with pytest.raises(DownloadStopped):
+        run_download_job(job, progress, should_stop, connections=4)
+    saved = downloads.load_segments(part_path_for(local_path), len(DATA), server.etags["/game.zip"])
+    assert saved is not None
+    return sum(segment[2] for segment in saved)
+
+
+def assert_downloaded(local_path, data):
+    assert os.path.getsize(local_path) == len(data)
+    with open(local_path, "rb") as archive:
+        assert hashlib.sha256(archive.read()).hexdigest() == hashlib.sha256(data).hexdigest()
+    assert not os.path.exists(part_path_for(local_path))
+    assert not os.path.exists(segments_path_for(part_path_for(local_path)))
+
+
+def test_resume_fetches_only_the_missing_segments(serve, tmp_path, recorded):
+    server = serve({"/game.zip": DATA}, bandwidth=BANDWIDTH)
+    local_path = str(tmp_path / "game.zip")
+    saved = download_part_of(server, local_path)
+    assert 0 < saved < len(DATA)
+    assert download(server, local_path, DATA) == local_path
+    assert_downloaded(local_path, DATA)
+    assert recorded == [len(DATA) - saved]
+
+
+def test_changed_file_starts_over(serve, tmp_path, recorded):
+    server = serve({"/game.zip": DATA}, bandwidth=BANDWIDTH)
+    local_path = str(tmp_path / "game.zip")
+    download_part_of(server, local_path)
+    # The saved segments no longer match the ETag, If-Range gets the whole new file.
+    server.add_file("/game.zip", CHANGED)
+    assert download(server, local_path, CHANGED) == local_path
+    assert_downloaded(local_path, CHANGED)
+    assert recorded == [len(CHANGED)]
+
+
+def test_corrupt_segment_state_starts_over(serve, tmp_path, recorded):
+    server = serve({"/game.zip": DATA}, bandwidth=BANDWIDTH)
+    local_path = str(tmp_path / "game.zip")
+    part_path = part_path_for(local_path)
+    with open(part_path, "wb") as part_file:
+        part_file.write(CHANGED)
+    with open(segments_path_for(part_path), "w") as segments_file:
+        segments_file.write('{"total": 524288, "segm')
+    assert download(server, local_path, DATA) == local_path
+    assert_downloaded(local_path, DATA)
+    assert recorded == [len(DATA)]
@@ -0,0 +1,24 @@
+from src.feeds import fetch_feed
+from src.scheduler import INTERACTIVE, PREFETCH, PooledConnections, scheduler
+
+RSS = (b'<?xml version="1.0"?><rss version="2.0"><channel><title>News</title>'
+       b'<item><title>Patch 1</title><link>http://example.com/1</link><guid>1</guid></item>'
+       b'</channel></rss>')
+
+
+def test_feed_fetches_go_through_the_scheduler(serve, tmp_path, monkeypatch):
+    server = serve({"/feed.xml": RSS})
+    scheduler.configure()
+    seen = []
+    do_open = PooledConnections.do_open
+
+    def spy(self, http_class, req, **kwargs):
+        seen.append(scheduler.current_traffic())
+        return do_open(self, http_class, req, **kwargs)
+    monkeypatch.setattr(PooledConnections, "do_open", spy)
+
+    updated = scheduler.bind(fetch_feed, PREFETCH)(1, server.url("/feed.xml"), str(tmp_path))
+    assert [entry["title"] for entry in updated["entries"]] == ["Patch 1"]
+    # The second fetch is a conditional GET answered with 304.
+    assert scheduler.bind(fetch_feed, INTERACTIVE)(1, server.url("/feed.xml"), str(tmp_path)) is None
+    assert seen == [PREFETCH, INTERACTIVE]
@@ -0,0 +1,15 @@
+from src.scheduler import Scheduler, limits_at
+
+
+def test_limits_accept_fractional_rates():
+    assert limits_at([{"max_kb_per_s": 1536.5, "max_host_kb_per_s": 2e3}]) == (1573376, 2048000)
+
+
+def test_configure_skips_bad_rules(capsys):
+    scheduler = Scheduler()
+    scheduler.installed = True
+    good = {"from": "22:00", "to": "06:00", "max_kb_per_s": 512}
+    scheduler.configure([{"from": "25:00", "to": "06:00"}, {"from": "08:00"}, {"max_kb_per_s": "fast"},
+                         "1024", good])
+    assert scheduler.rules == [good]
+    assert capsys.readouterr().out.count("Ignoring bandwidth limit") == 4
@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.catalog import catalog_changes
+
+
+def read_json(path):
+    with open(path, "r") as json_file:
+        return json.load(json_file)
+
+
+def write_json(path, data, indent=None):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as json_file:
+        json.dump(data, json_file, indent=indent)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    # Run by the game list maintainers before committing a new games.json: it
+    # stamps the next revision into games.json and writes the change file that
+    # launchers download instead of the whole list.
+    parser = argparse.ArgumentParser(description="Publish a new games.json with its change file.")
+    parser.add_argument("previous", help="the games.json launchers currently have")
+    parser.add_argument("catalog", help="the new games.json, updated in place")
+    parser.add_argument("--keep", type=int, default=50, help="number of change files to keep")
+    args = parser.parse_args(argv)
+
+    previous = read_json(args.previous)
+    catalog = read_json(args.catalog)
+    revision = previous.get("revision", 0) + 1
+    changes_folder = os.path.join(os.path.dirname(os.path.abspath(args.catalog)), "changes")
+    os.makedirs(changes_folder, exist_ok=True)
+
+    catalog["revision"] = revision
+    write_json(os.path.join(changes_folder, f"{revision}.json"), catalog_changes(previous, catalog, revision))
+    oldest = max(revision - args.keep + 1, 1)
+    for name in os.listdir(changes_folder):
+        number = name[:-len(".json")]
+        if number.isdigit() and int(number) < oldest:
+            os.remove(os.path.join(changes_folder, name))
+    # A launcher at revision oldest - 1 or later can catch up from the change
+    # files, unless their sizes add up to more than the whole list.
+    sizes = {str(number): os.path.getsize(os.path.join(changes_folder, f"{number}.json"))
+             for number in range(oldest, revision + 1)
+             if os.path.exists(os.path.join(changes_folder, f"{number}.json"))}
+    write_json(os.path.join(changes_folder, "revision.json"), {"revision": revision, "oldest": oldest, "sizes": sizes})
+    write_json(args.catalog, catalog, indent=4)
+    print(f"Published revision {revision}")
+
+
+if __name__ == "__main__":
+    main()